@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+# Production app server settings, e.g.
+#   gunicorn config.wsgi -c config/gunicorn.conf.py
+#   GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn config.asgi -c config/gunicorn.conf.py
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# Async workers overlap I/O inside one process, one per core is enough.
+# Sync/threaded workers block on the database, so run more of them.
+if "uvicorn" in worker_class:
+    default_workers = multiprocessing.cpu_count()
+else:
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers))
+
+# Without Redis the cache, the channel layer and the leaderboards live in
+# each process, so workers would grade with stale answer keys, keep their
+# own leaderboards and miss each other's websocket broadcasts
+if not os.getenv("REDIS_URL"):
+    if workers > 1 and "WEB_CONCURRENCY" in os.environ:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} needs REDIS_URL, per-process caches and "
+            "channel layers can't be shared between workers"
+        )
+    workers = 1
+
+# Each thread keeps its own persistent database connection, so the
+# connections per container are workers * threads
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks don't build up
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
@@ -0,0 +1,218 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class MetricsRegistry:
+    ENDPOINT_METRICS = (
+        ('requests_total', 'counter', 'Requests handled'),
+        ('queries_total', 'counter', 'SQL queries executed'),
+        ('sql_seconds_total', 'counter', 'Time spent in SQL'),
+        ('view_seconds_total', 'counter', 'Time spent in views outside SQL, serialization included'),
+        ('render_seconds_total', 'counter', 'Time spent rendering responses'),
+        ('response_bytes_total', 'counter', 'Response body bytes'),
+        ('duration_seconds_total', 'counter', 'Wall time spent handling requests'),
+        ('queries_max', 'gauge', 'Most SQL queries executed by a single request'),
+        ('budget_exceeded_total', 'counter', 'Requests that went over their query budget'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: defaultdict(float))
+        self._counters = defaultdict(float)
+
+    def observe(self, endpoint, queries, sql_seconds, view_seconds, render_seconds, response_bytes, duration,
+                over_budget):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats['requests_total'] += 1
+            stats['queries_total'] += queries
+            stats['sql_seconds_total'] += sql_seconds
+            stats['view_seconds_total'] += view_seconds
+            stats['render_seconds_total'] += render_seconds
+            stats['response_bytes_total'] += response_bytes
+            stats['duration_seconds_total'] += duration
+            stats['queries_max'] = max(stats['queries_max'], queries)
+            if over_budget:
+                stats['budget_exceeded_total'] += 1
+
+    def increment(self, name, value=1, **labels):
+        """Bump a free-form counter, e.g. cache hits"""
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def endpoint(self, endpoint):
+        with self._lock:
+            return dict(self._endpoints.get(endpoint, {}))
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._counters.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            lines = []
+            for metric, kind, help_text in self.ENDPOINT_METRICS:
+                name = f"http_endpoint_{metric}"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for endpoint, stats in sorted(self._endpoints.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[metric]:g}')
+
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+            return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def endpoint_name(request, view_func):
+    """``<app>.<ViewClass>.<action>`` for DRF views, the dotted function name otherwise"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+
+    app = cls.__module__.split('.')[0]
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+    else:
+        action = request.method.lower()
+    return f"{app}.{cls.__name__}.{action}"
+
+
+class _QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryMetricsMiddleware:
+    """
+    Record query count, SQL time, view time, render time and response bytes
+    per endpoint in ``registry``, exposed in the Prometheus text format by
+    ``metrics_view``. With ``METRICS_LOG_REQUESTS`` every request is also
+    logged as one JSON line.
+
+    DRF serializes inside the view, so serializer cost has no step of its own
+    to time. It is counted in the view time, which is the time between the
+    view being called and returning, less the SQL run meanwhile.
+
+    Budgets come from ``QUERY_BUDGETS`` (endpoint name -> max queries) with
+    ``QUERY_BUDGET_DEFAULT`` as the fallback. Going over a budget is logged,
+    and raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is on, as
+    tests turn it on with ``override_settings``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _QueryRecorder()
+        request._metrics_recorder = recorder
+        request._metrics_endpoint = None
+        request._metrics_view_started = None
+        request._metrics_view_seconds = None
+        request._metrics_render_seconds = 0.0
+        started = time.perf_counter()
+
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        endpoint = request._metrics_endpoint
+        if endpoint is None:
+            return response
+        if request._metrics_view_seconds is None:
+            # Plain and streaming responses skip process_template_response
+            self._finish_view(request)
+
+        duration = time.perf_counter() - started
+        response_bytes = 0 if response.streaming else len(response.content)
+        budget = settings.QUERY_BUDGETS.get(endpoint, settings.QUERY_BUDGET_DEFAULT)
+        over_budget = budget is not None and recorder.count > budget
+
+        registry.observe(endpoint, recorder.count, recorder.seconds, request._metrics_view_seconds,
+                         request._metrics_render_seconds, response_bytes, duration, over_budget)
+
+        if settings.METRICS_LOG_REQUESTS:
+            logger.info(json.dumps({
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'queries': recorder.count,
+                'sql_ms': round(recorder.seconds * 1000, 3),
+                'view_ms': round(request._metrics_view_seconds * 1000, 3),
+                'render_ms': round(request._metrics_render_seconds * 1000, 3),
+                'duration_ms': round(duration * 1000, 3),
+                'bytes': response_bytes,
+            }))
+
+        if over_budget:
+            message = f"{endpoint} ran {recorder.count} queries, budget is {budget}"
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_endpoint = endpoint_name(request, view_func)
+        request._metrics_view_started = (time.perf_counter(), request._metrics_recorder.seconds)
+
+    def _finish_view(self, request):
+        started, sql_seconds = request._metrics_view_started
+        request._metrics_view_seconds = max(
+            time.perf_counter() - started - (request._metrics_recorder.seconds - sql_seconds), 0.0
+        )
+
+    def process_template_response(self, request, response):
+        self._finish_view(request)
+        # DRF responses are rendered after the view returns, time that step too
+        render_started = time.perf_counter()
+
+        def finish_render(rendered):
+            request._metrics_render_seconds += time.perf_counter() - render_started
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    allowed = (
+        settings.DEBUG
+        or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        or (request.user.is_authenticated and request.user.is_staff)
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4')
@@ -5,12 +5,12 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-your-secret-key-here'
+SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", 'django-insecure-your-secret-key-here')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv("DJANGO_DEBUG", "1") == "1"
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv("DJANGO_ALLOWED_HOSTS", "").split(",") if host]
 
 # Application definition
 INSTALLED_APPS = [
@@ -20,15 +20,19 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',  # Add drf-spectacular
+    'channels',
     'quiz',
     'users',
 ]
 
 MIDDLEWARE = [
+    'config.metrics.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,19 +60,65 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database
-DATABASES = {
+# DATABASE_ENGINE=sqlite runs without Postgres, e.g. for local load tests
+if os.getenv("DATABASE_ENGINE", "postgresql") == "sqlite":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {'timeout': 20},  # wait for the write lock under concurrent requests
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("POSTGRES_DB", "config"),
+            'USER': os.getenv("POSTGRES_USER", "postgres"),
+            'PASSWORD': os.getenv("POSTGRES_PASSWORD", "postgres"),
+            'HOST': os.getenv("POSTGRES_HOST", "db"),
+            'PORT': os.getenv("POSTGRES_PORT", "5432"),
+            # Keep connections open between requests, checked before reuse
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            # Transaction pooling (pgbouncer) can't keep a server-side cursor
+            # open across transactions, fall back to client-side cursors
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv("DB_PGBOUNCER", "0") == "1",
+        }
+    }
+
+# Cache
+REDIS_URL = os.getenv("REDIS_URL")
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv("POSTGRES_DB", "config"),
-        'USER': os.getenv("POSTGRES_USER", "postgres"),
-        'PASSWORD': os.getenv("POSTGRES_PASSWORD", "postgres"),
-        'HOST': 'db',
-        'PORT': '5432',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+if REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+# Channel layers (websocket fan-out for competitive mode)
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+}
+
+if REDIS_URL:
+    CHANNEL_LAYERS['default'] = {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {
+            'hosts': [REDIS_URL],
+        },
+    }
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -96,6 +146,17 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# WhiteNoise serves collected static files, compressed and with far-future
+# cache headers, so the app server doesn't go through Django views for them
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (User uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -116,6 +177,24 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Request metrics and query budgets (see config/metrics.py)
+METRICS_LOG_REQUESTS = os.getenv("METRICS_LOG_REQUESTS", "0") == "1"
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"  # raise instead of logging, tests turn it on with override_settings
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'quiz.TestViewSet.list': 6,
+    'quiz.TestViewSet.retrieve': 6,
+    'quiz.TestViewSet.questions': 6,
+    'quiz.TestSessionViewSet.submit_response': 12,
+    'quiz.TestSessionViewSet.submit_responses': 10,
+    'quiz.TestSessionViewSet.complete': 24,
+    'quiz.TestViewSet.analytics': 6,
+    'quiz.CompetitiveSessionViewSet.list': 6,
+    'quiz.CompetitiveSessionViewSet.leaderboard': 6,
+    'users.UserProfileViewSet.friends': 6,
+}
+
 # drf-spectacular settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Quiz API',
@@ -142,3 +221,31 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
+# Quiz settings
+QUIZ_ANSWER_KEY_CACHE_SIZE = 512  # answer keys kept in each process
+QUIZ_ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24  # seconds in the shared cache
+QUIZ_LEADERBOARD_BACKEND = 'redis' if REDIS_URL else 'local'
+QUIZ_LEADERBOARD_LOCAL_BOARDS = 64  # materialized boards kept in each process
+QUIZ_LEADERBOARD_LOCAL_TTL = 30  # seconds before a process rebuilds its board from the database
+QUIZ_LEADERBOARD_REDIS_TTL = 60 * 60 * 24 * 7  # seconds a Redis board is kept after its last write
+QUIZ_LIVE_COMPETITIONS_CACHE_TIMEOUT = 60  # seconds
+QUIZ_MAX_VARIANTS = 50  # variants per create_variant request
+QUIZ_VARIANT_ASYNC_THRESHOLD = 500  # copied questions above which cloning runs as a job
+QUIZ_MAX_BATCH_RESPONSES = 200  # responses per submit_responses request
+QUIZ_TIME_LIMIT_GRACE = 5  # seconds accepted past a session's deadline
+QUIZ_EXPORT_CHUNK_SIZE = 10000  # rows per chunk of a session or response export
+
+# Users settings
+USERS_FRIEND_GRAPH_CACHE_TIMEOUT = 60 * 60  # seconds a profile's friend list is cached
+USERS_MAX_FRIEND_SUGGESTIONS = 100
+USERS_RANKING_REBUILD_INTERVAL = 300  # seconds between rebuilds of each process's rating index
+USERS_MAX_RANKING_NEIGHBORS = 25
+
+# Blitz quiz generation
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+QUIZ_LLM_CLIENT = os.getenv("QUIZ_LLM_CLIENT", "quiz.llm.OpenAICompletionClient")  # quiz.llm.StubCompletionClient offline
+QUIZ_LLM_BASE_URL = "https://openrouter.ai/api/v1"
+QUIZ_LLM_MODEL = "openai/gpt-3.5-turbo"
+QUIZ_BLITZ_QUESTIONS = 20
+QUIZ_BLITZ_CACHE_TTL = 60 * 60 * 24  # seconds a generated question set is reused
+QUIZ_BLITZ_CACHE_SIZE = 256  # question sets kept in each process
@@ -6,11 +6,13 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, Spec
 
 # Import admin customization
 import config.admin
+from config.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/quiz/', include('quiz.urls')),
     path('api/users/', include('users.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 
     # Swagger/OpenAPI endpoints
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
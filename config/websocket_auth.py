@@ -0,0 +1,29 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    token = Token.objects.select_related('user').filter(key=key).first()
+    return token.user if token else AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websocket connections with the same DRF tokens as the API,
+    passed either as ``?token=<key>`` or an ``Authorization: Token <key>`` header.
+    """
+
+    async def __call__(self, scope, receive, send):
+        key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        if key is None:
+            header = dict(scope.get('headers', [])).get(b'authorization', b'').decode()
+            if header.startswith('Token '):
+                key = header[len('Token '):]
+
+        scope = dict(scope, user=await get_token_user(key) if key else AnonymousUser())
+        return await super().__call__(scope, receive, send)
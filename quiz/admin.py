@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Test, Question, Answer, TestSession, UserResponse, CompetitiveSession
+from .models import Test, Question, Answer, TestSession, UserResponse, CompetitiveSession, Job, QuestionStats
 
 
 class AnswerInline(admin.TabularInline):
@@ -22,6 +22,9 @@ class UserResponseInline(admin.TabularInline):
     fields = ('question', 'open_response', 'response_time', 'get_selected_answers')
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('question').prefetch_related('selected_answers')
+
     def get_selected_answers(self, obj):
         return ", ".join([answer.text for answer in obj.selected_answers.all()])
 
@@ -33,7 +36,7 @@ class TestAdmin(admin.ModelAdmin):
     list_display = ('title', 'creator', 'mode', 'time_limit', 'created_at', 'is_active', 'question_count')
     list_filter = ('mode', 'is_active', 'created_at')
     search_fields = ('title', 'description', 'creator__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'question_count', 'total_points')
     fieldsets = (
         (None, {
             'fields': ('title', 'description', 'creator')
@@ -42,17 +45,12 @@ class TestAdmin(admin.ModelAdmin):
             'fields': ('time_limit', 'shuffle_questions', 'shuffle_answers', 'mode', 'is_active')
         }),
         ('Metadata', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'question_count', 'total_points'),
             'classes': ('collapse',)
         }),
     )
     inlines = [QuestionInline]
 
-    def question_count(self, obj):
-        return obj.questions.count()
-
-    question_count.short_description = 'Questions'
-
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
@@ -116,6 +114,10 @@ class UserResponseAdmin(admin.ModelAdmin):
     list_filter = ('session__status', 'session__test')
     search_fields = ('session__user__username', 'question__text')
     readonly_fields = ('session', 'question', 'selected_answers', 'open_response', 'response_time')
+    list_select_related = ('session__user', 'question')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('selected_answers')
 
     def session_user(self, obj):
         return obj.session.user.username
@@ -159,10 +161,33 @@ class CompetitiveSessionAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_participants_count()
+
     def participant_count(self, obj):
-        if obj.started_at and obj.ended_at:
-            return obj.get_participants().count()
-        return 0
+        return obj.num_participants
 
     participant_count.short_description = 'Participants'
 
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'created_by', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('kind', 'status', 'created_at')
+    search_fields = ('created_by__username',)
+    readonly_fields = ('kind', 'payload', 'result', 'error', 'status', 'created_by',
+                       'created_at', 'started_at', 'finished_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(QuestionStats)
+class QuestionStatsAdmin(admin.ModelAdmin):
+    list_display = ('question', 'attempts', 'correct', 'graded', 'updated_at')
+    list_select_related = ('question',)
+    search_fields = ('question__text', 'question__test__title')
+    readonly_fields = ('question', *QuestionStats.COUNTER_FIELDS, 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
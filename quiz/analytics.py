@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .answer_keys import get_answer_key
+from .chunking import chunked_rows
+from .models import QuestionStats, TestSession, UserResponse
+from .scoring import is_response_correct
+
+
+def selected_answer_ids(response_ids):
+    """Ids of the answers selected in each response, in one query"""
+    selected = defaultdict(list)
+    for response_id, answer_id in UserResponse.selected_answers.through.objects.filter(
+        userresponse_id__in=response_ids
+    ).values_list('userresponse_id', 'answer_id'):
+        selected[response_id].append(answer_id)
+    return selected
+
+
+def _locked_stats(question_ids):
+    """Stats rows of the questions, created when missing and locked in a stable order"""
+    QuestionStats.objects.bulk_create(
+        [QuestionStats(question_id=question_id) for question_id in question_ids],
+        ignore_conflicts=True
+    )
+    return {
+        stats.question_id: stats
+        for stats in QuestionStats.objects.select_for_update().filter(
+            question_id__in=question_ids
+        ).order_by('question_id')
+    }
+
+
+def _save(stats):
+    for question_stats in stats:
+        # bulk_update doesn't run pre_save, so auto_now isn't applied
+        question_stats.updated_at = timezone.now()
+    QuestionStats.objects.bulk_update(stats, [*QuestionStats.COUNTER_FIELDS, 'updated_at'])
+
+
+def record_session_stats(session):
+    """
+    Add the responses of a completed session to the question rollups.
+    Uses the cached answer key and a fixed number of queries, however many
+    questions the test has.
+    """
+    answer_key = get_answer_key(session.test_id)
+    responses = list(
+        UserResponse.objects.filter(session=session)
+        .values_list('id', 'question_id', 'response_time')
+    )
+    responses = [response for response in responses if response[1] in answer_key]
+    if not responses:
+        return
+
+    selected = selected_answer_ids([response_id for response_id, _, _ in responses])
+    total_points = session.test.total_points
+    score_share = (session.score or 0) / total_points if total_points else 0
+
+    with transaction.atomic():
+        stats = _locked_stats({question_id for _, question_id, _ in responses})
+        for response_id, question_id, response_time in responses:
+            question_type, _, correct_ids = answer_key[question_id]
+            stats[question_id].add_response(
+                is_response_correct(question_type, correct_ids, selected[response_id]),
+                selected[response_id],
+                response_time,
+                score_share
+            )
+        _save(stats.values())
+
+
+def rebuild_test_stats(test, chunk_size=2000):
+    """
+    Recompute the rollups of one test from its completed and expired sessions.
+
+    Responses are read chunk by chunk (see ``chunked_rows``) and their
+    selections are loaded per chunk, so memory holds one chunk plus one stats
+    row per question. The stats rows stay locked while rebuilding, so sessions
+    completing meanwhile wait for it instead of interleaving their updates.
+    """
+    answer_key = get_answer_key(test.pk)
+    total_points = test.total_points
+
+    with transaction.atomic():
+        stats = _locked_stats(list(answer_key))
+        for question_stats in stats.values():
+            question_stats.reset()
+
+        responses = (
+            UserResponse.objects.filter(session__test=test, session__status__in=TestSession.FINISHED_STATUSES)
+            .values_list('id', 'question_id', 'response_time', 'session__score')
+        )
+        for chunk in chunked_rows(responses, chunk_size):
+            selected = selected_answer_ids([row[0] for row in chunk])
+            for response_id, question_id, response_time, score in chunk:
+                if question_id not in answer_key:
+                    continue
+                question_type, _, correct_ids = answer_key[question_id]
+                stats[question_id].add_response(
+                    is_response_correct(question_type, correct_ids, selected[response_id]),
+                    selected[response_id],
+                    response_time,
+                    (score or 0) / total_points if total_points else 0
+                )
+
+        _save(stats.values())
+    return len(stats)
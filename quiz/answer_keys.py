@@ -0,0 +1,85 @@
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .caching import LRUCache
+from .models import Question, Answer
+
+# Process-local tier in front of the shared Django cache
+_local_keys = LRUCache(maxsize=settings.QUIZ_ANSWER_KEY_CACHE_SIZE)
+
+
+def _version_cache_key(test_id):
+    return f"quiz:answer-key-version:{test_id}"
+
+
+def _answer_key_cache_key(test_id, version):
+    return f"quiz:answer-key:{test_id}:{version}"
+
+
+def load_answer_key(test_id):
+    """
+    Compile the answer key of a test from the database in two queries:
+    question id -> (question type, points, frozenset of correct answer ids)
+    """
+    correct = defaultdict(set)
+    for question_id, answer_id in Answer.objects.filter(
+        question__test_id=test_id, is_correct=True
+    ).values_list('question_id', 'id'):
+        correct[question_id].add(answer_id)
+
+    return {
+        question_id: (question_type, points, frozenset(correct[question_id]))
+        for question_id, question_type, points in Question.objects.filter(
+            test_id=test_id
+        ).values_list('id', 'question_type', 'points')
+    }
+
+
+def _current_version(test_id):
+    version_key = _version_cache_key(test_id)
+    version = cache.get(version_key)
+    if version is None:
+        # Another process may be racing us, whoever adds first wins
+        cache.add(version_key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def get_answer_key(test_id):
+    """
+    Return the compiled answer key of a test.
+
+    Looks in the process-local LRU first, then in the shared cache and only
+    compiles the key from the database when both miss. Entries are tagged
+    with a version stored in the shared cache, so an invalidation in one
+    process is seen by every other process on its next lookup.
+    """
+    version = _current_version(test_id)
+
+    answer_key = _local_keys.get((test_id, version))
+    if answer_key is not None:
+        return answer_key
+
+    shared_key = _answer_key_cache_key(test_id, version)
+    answer_key = cache.get(shared_key)
+    if answer_key is None:
+        answer_key = load_answer_key(test_id)
+        cache.set(shared_key, answer_key, timeout=settings.QUIZ_ANSWER_KEY_CACHE_TIMEOUT)
+
+    _local_keys.set((test_id, version), answer_key)
+    return answer_key
+
+
+def _bump_version(test_id):
+    cache.set(_version_cache_key(test_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_answer_key(test_id):
+    """Drop the cached answer key of a test in every process"""
+    _bump_version(test_id)
+    # Graders may cache the old rows under the new version until the change is committed
+    transaction.on_commit(lambda: _bump_version(test_id))
@@ -0,0 +1,215 @@
+import hashlib
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from config.metrics import registry
+from .answer_keys import invalidate_answer_key
+from .caching import LRUCache
+from .llm import get_completion_client, iter_json_objects
+from .models import Test, Question, Answer
+
+PROMPT_TEMPLATE = (
+    "Generate {count} multiple-choice questions about {topic}. "
+    "For each question, provide 4 options and indicate the correct answer. "
+    "Format as JSON with structure: "
+    "[{{\"question\": \"...\", \"options\": [\"A\", \"B\", \"C\", \"D\"], \"correct\": \"A\"}}] "
+    "Return only the JSON array."
+)
+
+
+# Process-local tier in front of the shared Django cache
+_local_questions = LRUCache(maxsize=settings.QUIZ_BLITZ_CACHE_SIZE, ttl=settings.QUIZ_BLITZ_CACHE_TTL)
+
+
+def source_topic(test):
+    return f"{test.title}. {test.description}"
+
+
+def normalize_topic(topic):
+    """Fold case, punctuation and spacing so near-identical topics share a cache entry"""
+    return " ".join(re.sub(r"[^\w\s]", " ", topic.casefold()).split())
+
+
+def questions_cache_key(topic, model=None):
+    """Content address of a generation: normalized topic, model and prompt template"""
+    digest = hashlib.sha256("\0".join([
+        normalize_topic(topic),
+        model or settings.QUIZ_LLM_MODEL,
+        PROMPT_TEMPLATE,
+        str(settings.QUIZ_BLITZ_QUESTIONS),
+    ]).encode()).hexdigest()
+    return f"quiz:blitz-questions:{digest}"
+
+
+def get_cached_questions(topic, record_miss=True):
+    """
+    Parsed questions of an earlier generation of this topic, or None.
+    Callers that will retry the lookup later pass ``record_miss=False``
+    so a request is only counted once.
+    """
+    key = questions_cache_key(topic)
+    entry = _local_questions.get(key)
+    if entry is None:
+        entry = cache.get(key)
+        if entry is not None:
+            _local_questions.set(key, entry)
+
+    if entry is None:
+        if record_miss:
+            registry.increment('quiz_blitz_cache_requests_total', result='miss')
+        return None
+
+    registry.increment('quiz_blitz_cache_requests_total', result='hit')
+    # Every hit is a model call, and its latency, that we didn't pay for
+    registry.increment('quiz_blitz_cache_saved_seconds_total', entry['generation_seconds'])
+    return entry['questions']
+
+
+def cache_questions(topic, questions_data, generation_seconds):
+    key = questions_cache_key(topic)
+    entry = {'questions': questions_data, 'generation_seconds': generation_seconds}
+    cache.set(key, entry, timeout=settings.QUIZ_BLITZ_CACHE_TTL)
+    _local_questions.set(key, entry)
+
+
+def build_messages(topic):
+    return [
+        {"role": "system", "content": "You are a helpful assistant that generates quiz questions."},
+        {"role": "user", "content": PROMPT_TEMPLATE.format(count=settings.QUIZ_BLITZ_QUESTIONS, topic=topic)},
+    ]
+
+
+def is_valid_question(q_data):
+    return (
+        isinstance(q_data, dict)
+        and isinstance(q_data.get('question'), str)
+        and isinstance(q_data.get('options'), list)
+        and len(q_data['options']) >= 2
+        and isinstance(q_data.get('correct'), str)
+    )
+
+
+def build_question(blitz_quiz, q_data, order):
+    """Unsaved Question and Answer objects for one generated question"""
+    question = Question(
+        id=uuid.uuid4(),
+        test=blitz_quiz,
+        text=q_data['question'],
+        question_type='single',
+        points=1,
+        order=order
+    )
+    answers = [
+        Answer(
+            id=uuid.uuid4(),
+            question=question,
+            text=str(option_text),
+            is_correct=q_data['correct'].strip().upper()[:1] == chr(65 + j)  # Convert A, B, C, D to index
+        )
+        for j, option_text in enumerate(q_data['options'])
+    ]
+    return question, answers
+
+
+def new_blitz_test(source_test, user):
+    return Test.objects.create(
+        title=f"Blitz Quiz: {source_test.title}",
+        description=f"Auto-generated blitz quiz based on {source_test.title}",
+        creator=user,
+        time_limit=600,  # 10 minutes
+        shuffle_questions=True,
+        shuffle_answers=True,
+        mode='blitz'
+    )
+
+
+@transaction.atomic
+def create_blitz_test(source_test, user, questions_data):
+    """Create a blitz quiz and bulk insert its questions and answers in one transaction"""
+    blitz_quiz = new_blitz_test(source_test, user)
+
+    questions = []
+    answers = []
+    valid = [q_data for q_data in questions_data if is_valid_question(q_data)]
+    for i, q_data in enumerate(valid[:settings.QUIZ_BLITZ_QUESTIONS]):
+        question, question_answers = build_question(blitz_quiz, q_data, i)
+        questions.append(question)
+        answers.extend(question_answers)
+
+    Question.objects.bulk_create(questions)
+    Answer.objects.bulk_create(answers)
+
+    # Bulk inserts skip the question signals, store the totals directly
+    blitz_quiz.question_count = len(questions)
+    blitz_quiz.total_points = sum(question.points for question in questions)
+    Test.objects.filter(pk=blitz_quiz.pk).update(
+        question_count=blitz_quiz.question_count,
+        total_points=blitz_quiz.total_points
+    )
+    return blitz_quiz
+
+
+def stream_blitz_test(source_test, user, topic, progress=None):
+    """
+    Stream questions from the model into a new blitz quiz. Each question is
+    saved as soon as its JSON object closes, so the quiz fills up while the
+    model is still writing. ``progress(blitz_quiz, count)`` is called after
+    the quiz is created and after every saved question. If the stream fails
+    partway the quiz keeps its saved questions but is made inactive.
+    """
+    blitz_quiz = new_blitz_test(source_test, user)
+    if progress:
+        progress(blitz_quiz, 0)
+
+    started = time.perf_counter()
+    saved = []
+    try:
+        chunks = get_completion_client().stream(build_messages(topic), settings.QUIZ_LLM_MODEL)
+        for q_data in iter_json_objects(chunks):
+            if not is_valid_question(q_data):
+                continue
+
+            question, answers = build_question(blitz_quiz, q_data, len(saved))
+            with transaction.atomic():
+                question.save(force_insert=True)
+                Answer.objects.bulk_create(answers)
+            saved.append(q_data)
+            if progress:
+                progress(blitz_quiz, len(saved))
+            if len(saved) >= settings.QUIZ_BLITZ_QUESTIONS:
+                break
+    except Exception:
+        if saved:
+            # Sessions may already run on the saved questions, keep them but
+            # mark the quiz unfinished instead of leaving it listed as active
+            Test.objects.filter(pk=blitz_quiz.pk).update(is_active=False)
+        else:
+            blitz_quiz.delete()
+        raise
+
+    if not saved:
+        blitz_quiz.delete()
+        raise ValueError("Failed to parse generated questions.")
+
+    # Sessions started mid-generation may have cached a partial key
+    invalidate_answer_key(blitz_quiz.pk)
+    cache_questions(topic, saved, time.perf_counter() - started)
+    return blitz_quiz
+
+
+def generate_blitz_test(source_test, user, progress=None):
+    """Build a blitz quiz about a test's topic, asking the model only on a cache miss"""
+    topic = source_topic(source_test)
+    questions_data = get_cached_questions(topic)
+    if questions_data is None:
+        return stream_blitz_test(source_test, user, topic, progress)
+
+    blitz_quiz = create_blitz_test(source_test, user, questions_data)
+    if progress:
+        progress(blitz_quiz, blitz_quiz.question_count)
+    return blitz_quiz
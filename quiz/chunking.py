@@ -0,0 +1,32 @@
+from itertools import islice
+
+from django.db import connections
+
+
+def chunked_rows(queryset, chunk_size):
+    """
+    Rows of a ``values_list`` queryset whose first column is the primary
+    key, ``chunk_size`` at a time.
+
+    ``iterator()`` reads through a server-side cursor on Postgres, so memory
+    holds one chunk whatever the table size. With DISABLE_SERVER_SIDE_CURSORS
+    (pgbouncer in transaction mode) it would fetch the whole result at once,
+    so the rows are paged on the primary key instead.
+    """
+    if connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        queryset = queryset.order_by('pk')
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            chunk = list(page[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1][0]
+
+    rows = queryset.order_by().iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
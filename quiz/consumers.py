@@ -0,0 +1,55 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .events import competition_group
+from .models import CompetitiveSession
+
+
+class CompetitiveSessionConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes start/end events, answer progress and leaderboard changes of a
+    competitive session to its participants. Clients only listen, all
+    actions still go through the REST API.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.competitive_session_id = self.scope['url_route']['kwargs']['pk']
+        competitive_session = await self.get_competitive_session(user)
+        if competitive_session is None:
+            # Same visibility as the REST API, hidden competitions look missing
+            await self.close(code=4404)
+            return
+
+        self.group_name = competition_group(self.competitive_session_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        await self.send_json({
+            'event': 'state',
+            'data': {
+                'id': str(competitive_session.pk),
+                'is_active': competitive_session.is_active,
+                'started_at': competitive_session.started_at and competitive_session.started_at.isoformat(),
+                'ended_at': competitive_session.ended_at and competitive_session.ended_at.isoformat(),
+            }
+        })
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Keep-alive for clients behind proxies that drop idle sockets
+        if content.get('event') == 'ping':
+            await self.send_json({'event': 'pong'})
+
+    async def competitive_event(self, message):
+        await self.send_json({'event': message['event'], 'data': message['data']})
+
+    @database_sync_to_async
+    def get_competitive_session(self, user):
+        return CompetitiveSession.objects.visible_to(user).filter(pk=self.competitive_session_id).first()
@@ -0,0 +1,52 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CompetitiveSession
+
+
+def competition_group(competitive_session_id):
+    return f"competitive_{competitive_session_id}"
+
+
+def broadcast(competitive_session_id, event, data):
+    """Push an event to every participant connected to a competitive session"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    message = {
+        'type': 'competitive.event',
+        'event': event,
+        'data': data,
+    }
+    # Only tell clients about changes that were actually committed
+    transaction.on_commit(
+        lambda: async_to_sync(channel_layer.group_send)(competition_group(competitive_session_id), message)
+    )
+
+
+def _live_competitions_cache_key(test_id):
+    return f"quiz:live-competitions:{test_id}"
+
+
+def live_competitions(test_id):
+    """Ids of the running competitive sessions of a test, cached between answers"""
+    return cache.get_or_set(
+        _live_competitions_cache_key(test_id),
+        lambda: [
+            str(pk) for pk in CompetitiveSession.objects.filter(
+                test_id=test_id,
+                is_active=True,
+                started_at__isnull=False,
+                ended_at__isnull=True
+            ).values_list('id', flat=True)
+        ],
+        timeout=settings.QUIZ_LIVE_COMPETITIONS_CACHE_TIMEOUT
+    )
+
+
+def invalidate_live_competitions(test_id):
+    cache.delete(_live_competitions_cache_key(test_id))
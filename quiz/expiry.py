@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TestSession
+from .results import record_finished_sessions
+from .scoring import grade_sessions
+
+
+def expire_sessions(session_ids, now=None):
+    """
+    Mark in-progress sessions as expired with one UPDATE and score them with
+    bulk grading. Expired sessions count like completed ones, towards the
+    profile, the question rollups and the leaderboards. Sessions that were
+    completed in the meantime are left alone. Returns how many sessions were
+    expired.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = TestSession.objects.filter(
+            id__in=session_ids, status='in_progress'
+        ).update(status='expired', completed_at=now)
+
+        sessions = list(
+            TestSession.objects.filter(id__in=session_ids, status='expired', score__isnull=True)
+            .select_related('test', 'user__profile')
+        )
+        scores = grade_sessions(sessions)
+        for session in sessions:
+            session.score = scores[session.pk]
+        TestSession.objects.bulk_update(sessions, ['score'])
+        record_finished_sessions(sessions)
+    return expired
+
+
+def expire_overdue_sessions(now=None, batch_size=500):
+    """Expire every session past its deadline, ``batch_size`` sessions per transaction"""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.QUIZ_TIME_LIMIT_GRACE)
+    total = 0
+    while True:
+        batch = list(
+            TestSession.objects.filter(status='in_progress', expires_at__lt=cutoff)
+            .order_by('expires_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return total
+        total += expire_sessions(batch, now)
@@ -0,0 +1,192 @@
+import csv
+import io
+
+from .analytics import selected_answer_ids
+from .chunking import chunked_rows
+from .models import TestSession, UserResponse
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = {
+    # format: (file extension, content type)
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+    'csv': ('csv', 'text/csv'),
+}
+
+# Columns of each table as (name, values_list lookup, kind). The first column
+# must be the primary key, chunks are paged on it without server-side cursors.
+TABLES = {
+    'sessions': (TestSession, [
+        ('id', 'id', 'uuid'),
+        ('test_id', 'test_id', 'uuid'),
+        ('user_id', 'user_id', 'int'),
+        ('status', 'status', 'string'),
+        ('score', 'score', 'int'),
+        ('started_at', 'started_at', 'timestamp'),
+        ('completed_at', 'completed_at', 'timestamp'),
+        ('expires_at', 'expires_at', 'timestamp'),
+    ]),
+    'responses': (UserResponse, [
+        ('id', 'id', 'uuid'),
+        ('session_id', 'session_id', 'uuid'),
+        ('test_id', 'session__test_id', 'uuid'),
+        ('user_id', 'session__user_id', 'int'),
+        ('question_id', 'question_id', 'uuid'),
+        ('response_time', 'response_time', 'float'),
+        ('open_response', 'open_response', 'string'),
+    ]),
+}
+
+# Added to each responses chunk from the M2M table
+SELECTED_ANSWERS_COLUMN = ('selected_answer_ids', 'uuid_list')
+
+
+def available_formats():
+    if pyarrow is None:
+        return ['csv']
+    return list(FORMATS)
+
+
+def default_format():
+    return 'parquet' if pyarrow is not None else 'csv'
+
+
+def export_filename(table, file_format):
+    return f"{table}.{FORMATS[file_format][0]}"
+
+
+def content_type(file_format):
+    return FORMATS[file_format][1]
+
+
+def _arrow_type(kind):
+    return {
+        'uuid': pyarrow.string(),
+        'string': pyarrow.string(),
+        'int': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'timestamp': pyarrow.timestamp('us', tz='UTC'),
+        'uuid_list': pyarrow.list_(pyarrow.string()),
+    }[kind]
+
+
+def _uuid(value):
+    return None if value is None else str(value)
+
+
+def _csv_value(kind, value):
+    if value is None:
+        return ''
+    if kind == 'timestamp':
+        return value.isoformat()
+    if kind == 'uuid_list':
+        return ' '.join(str(item) for item in value)
+    return value
+
+
+def _table_chunks(table, test_id=None, chunk_size=10000):
+    """Column names and kinds of a table, then its rows as lists of columns, one chunk at a time"""
+    model, columns = TABLES[table]
+    queryset = model.objects.all()
+    if test_id is not None:
+        queryset = queryset.filter(**{'test_id' if table == 'sessions' else 'session__test_id': test_id})
+    queryset = queryset.values_list(*[lookup for _, lookup, _ in columns])
+
+    names = [name for name, _, _ in columns]
+    kinds = [kind for _, _, kind in columns]
+    if table == 'responses':
+        names.append(SELECTED_ANSWERS_COLUMN[0])
+        kinds.append(SELECTED_ANSWERS_COLUMN[1])
+    yield names, kinds
+
+    for chunk in chunked_rows(queryset, chunk_size):
+        data = [list(column) for column in zip(*chunk)]
+        if table == 'responses':
+            selected = selected_answer_ids(data[0])
+            data.append([[str(answer_id) for answer_id in selected[response_id]] for response_id in data[0]])
+        for i, kind in enumerate(kinds):
+            if kind == 'uuid':
+                data[i] = [_uuid(value) for value in data[i]]
+        yield data
+
+
+class _Buffer:
+    """Write-only file whose content is handed out and dropped after each chunk"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _export_arrow(chunks, file_format):
+    names, kinds = next(chunks)
+    schema = pyarrow.schema([(name, _arrow_type(kind)) for name, kind in zip(names, kinds)])
+    buffer = _Buffer()
+    if file_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+    else:
+        writer = pyarrow.ipc.new_file(buffer, schema)
+
+    for data in chunks:
+        # One Parquet row group or Arrow record batch per chunk
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(data, schema)],
+            schema=schema
+        ))
+        yield buffer.drain()
+    writer.close()
+    yield buffer.drain()
+
+
+def _export_csv(chunks):
+    names, kinds = next(chunks)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(names)
+    for data in chunks:
+        writer.writerows(
+            [_csv_value(kind, value) for kind, value in zip(kinds, row)]
+            for row in zip(*data)
+        )
+        yield text.getvalue().encode()
+        text.seek(0)
+        text.truncate()
+    yield text.getvalue().encode()
+
+
+def iter_export(table, file_format, test_id=None, chunk_size=10000):
+    """
+    Export ``table`` ('sessions' or 'responses') as bytes, one chunk of rows
+    at a time, for a file or a streaming response. Responses carry the ids of
+    their selected answers, a list column in Parquet and Arrow, space
+    separated in CSV. Parquet and Arrow need pyarrow, see ``available_formats``.
+    """
+    chunks = _table_chunks(table, test_id=test_id, chunk_size=chunk_size)
+    if file_format == 'csv':
+        return _export_csv(chunks)
+    return _export_arrow(chunks, file_format)
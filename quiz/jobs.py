@@ -0,0 +1,84 @@
+import logging
+import traceback
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job, Test
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def register(kind):
+    """Register a function as the handler of a job kind"""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, user=None):
+    """Queue a job for the ``run_jobs`` worker"""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, payload=payload, created_by=user)
+
+
+def claim_next():
+    """Atomically take the oldest queued job, other workers skip the locked row"""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_job(job):
+    """Run a claimed job and store its result or error"""
+    try:
+        job.result = _handlers[job.kind](job)
+        job.status = 'completed'
+        fields = ['result', 'status', 'finished_at']
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        job.error = traceback.format_exc()
+        job.status = 'failed'
+        # Keep the progress the handler stored, e.g. a partly generated quiz
+        job.result = Job.objects.filter(pk=job.pk).values_list('result', flat=True).first()
+        fields = ['error', 'status', 'finished_at']
+    job.finished_at = timezone.now()
+    job.save(update_fields=fields)
+    return job
+
+
+@register('create_variants')
+def create_variants_job(job):
+    test = Test.objects.get(pk=job.payload['test'])
+    variants = test.create_variants(job.payload['count'])
+    return {'tests': [str(variant.pk) for variant in variants]}
+
+
+@register('generate_blitz')
+def generate_blitz_job(job):
+    from .blitz import generate_blitz_test
+
+    test = Test.objects.get(pk=job.payload['test'])
+    user = User.objects.get(pk=job.payload['user'])
+
+    def progress(blitz_quiz, count):
+        # Let clients open the quiz while the rest is still being generated
+        Job.objects.filter(pk=job.pk).update(result={'test': str(blitz_quiz.pk), 'questions': count})
+
+    blitz_quiz = generate_blitz_test(test, user, progress=progress)
+    return {'test': str(blitz_quiz.pk), 'questions': blitz_quiz.questions.count()}
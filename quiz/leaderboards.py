@@ -0,0 +1,234 @@
+import bisect
+import json
+import threading
+
+from django.conf import settings
+from django.db.models import Avg, Q
+
+from .caching import LRUCache
+from .models import CompetitiveSession
+
+
+def sort_key(entry):
+    """Higher score first, then faster completion, then user id for stable ties"""
+    return (-entry['score'], entry['completion_time'], entry['user_id'])
+
+
+class LocalLeaderboard:
+    """
+    In-process stand-in for a Redis sorted set.
+
+    Keeps one entry per user (their best result) in a list sorted by
+    ``(-score, completion_time)``. Positions are found by binary search.
+    It only sees completions handled by its own process, so the store
+    rebuilds it from the database every ``local_ttl`` seconds.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, entry):
+        with self._lock:
+            current = self._entries.get(entry['user_id'])
+            if current is not None and sort_key(current) <= sort_key(entry):
+                return False
+            if current is not None:
+                del self._keys[bisect.bisect_left(self._keys, sort_key(current))]
+            bisect.insort(self._keys, sort_key(entry))
+            self._entries[entry['user_id']] = entry
+            return True
+
+    def page(self, offset, limit):
+        with self._lock:
+            keys = self._keys[offset:offset + limit]
+            return [
+                dict(self._entries[key[2]], rank=offset + i + 1)
+                for i, key in enumerate(keys)
+            ]
+
+    def entry_for(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return dict(entry, rank=bisect.bisect_left(self._keys, sort_key(entry)) + 1)
+
+
+class RedisLeaderboard:
+    """
+    Leaderboard stored in a Redis sorted set with the entries in a hash.
+
+    The sorted set score packs ``score`` and ``completion_time`` into a
+    single float so that ZREVRANGE/ZREVRANK return the leaderboard order.
+    """
+
+    def __init__(self, client, board_id):
+        self.client = client
+        self.ranking_key = f"quiz:leaderboard:{board_id}:ranking"
+        self.entries_key = f"quiz:leaderboard:{board_id}:entries"
+
+    @staticmethod
+    def _zscore(entry):
+        completion_ms = min(int(entry['completion_time'] * 1000), 10 ** 9 - 1)
+        return entry['score'] * 10 ** 9 - completion_ms
+
+    def __len__(self):
+        return self.client.zcard(self.ranking_key)
+
+    def add(self, entry):
+        member = str(entry['user_id'])
+        # GT only replaces the user's entry when the new result ranks higher
+        changed = self.client.zadd(self.ranking_key, {member: self._zscore(entry)}, gt=True, ch=True)
+        if changed:
+            self.client.hset(self.entries_key, member, json.dumps(entry))
+        return bool(changed)
+
+    def page(self, offset, limit):
+        if limit <= 0:
+            return []
+        members = self.client.zrevrange(self.ranking_key, offset, offset + limit - 1)
+        if not members:
+            return []
+        payloads = self.client.hmget(self.entries_key, members)
+        return [
+            dict(json.loads(payload), rank=offset + i + 1)
+            for i, payload in enumerate(payloads) if payload is not None
+        ]
+
+    def entry_for(self, user_id):
+        member = str(user_id)
+        rank = self.client.zrevrank(self.ranking_key, member)
+        payload = self.client.hget(self.entries_key, member)
+        if rank is None or payload is None:
+            return None
+        return dict(json.loads(payload), rank=rank + 1)
+
+    def clear(self):
+        self.client.delete(self.ranking_key, self.entries_key)
+
+
+class LeaderboardStore:
+    """Hands out materialized leaderboards, building them from the database on first use"""
+
+    def __init__(self, backend, redis_url=None, max_local_boards=64, local_ttl=30, redis_ttl=None):
+        self.backend = backend
+        self.redis_ttl = redis_ttl
+        self._local_boards = LRUCache(maxsize=max_local_boards, ttl=local_ttl)
+        self._build_lock = threading.Lock()
+        self._redis = None
+        if backend == 'redis':
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def _built_key(self, board_id):
+        return f"quiz:leaderboard:{board_id}:built"
+
+    def _expire(self, board_id):
+        """
+        Let a Redis board expire ``redis_ttl`` seconds after its last write,
+        so boards of finished competitions don't stay forever. An expired
+        board is rebuilt from the database on the next read.
+        """
+        if self.redis_ttl is None:
+            return
+        board = RedisLeaderboard(self._redis, board_id)
+        pipeline = self._redis.pipeline()
+        for key in (board.ranking_key, board.entries_key, self._built_key(board_id)):
+            pipeline.expire(key, self.redis_ttl)
+        pipeline.execute()
+
+    def _lookup(self, board_id):
+        """Return the board if it has already been materialized"""
+        if self._redis is not None:
+            if self._redis.exists(self._built_key(board_id)):
+                return RedisLeaderboard(self._redis, board_id)
+            return None
+        return self._local_boards.get(board_id)
+
+    def get(self, competitive_session):
+        board = self._lookup(competitive_session.pk)
+        if board is None:
+            board = self.build(competitive_session)
+        return board
+
+    def build(self, competitive_session):
+        """Materialize a leaderboard from the completed sessions in one query"""
+        with self._build_lock:
+            if self._redis is not None:
+                board = RedisLeaderboard(self._redis, competitive_session.pk)
+                board.clear()
+            else:
+                board = LocalLeaderboard()
+
+            for entry in competitive_session.get_leaderboard():
+                board.add(entry)
+
+            if self._redis is not None:
+                self._redis.set(self._built_key(competitive_session.pk), 1)
+                self._expire(competitive_session.pk)
+            else:
+                self._local_boards.set(competitive_session.pk, board)
+            return board
+
+    def record(self, board_id, entry):
+        """
+        Add a result to a board, boards that were never read are built lazily instead.
+        Returns the user's ranked entry when the board changed.
+        """
+        with self._build_lock:
+            board = self._lookup(board_id)
+            if board is not None and board.add(entry):
+                if self._redis is not None:
+                    self._expire(board_id)
+                return board.entry_for(entry['user_id'])
+        return None
+
+
+leaderboards = LeaderboardStore(
+    settings.QUIZ_LEADERBOARD_BACKEND,
+    redis_url=settings.REDIS_URL,
+    max_local_boards=settings.QUIZ_LEADERBOARD_LOCAL_BOARDS,
+    local_ttl=settings.QUIZ_LEADERBOARD_LOCAL_TTL,
+    redis_ttl=settings.QUIZ_LEADERBOARD_REDIS_TTL,
+)
+
+
+def leaderboard_entry(session, avg_response_time):
+    return {
+        'user_id': session.user_id,
+        'user': session.user.username,
+        'score': session.score or 0,
+        'completion_time': (session.completed_at - session.started_at).total_seconds(),
+        'avg_response_time': avg_response_time or 0,
+    }
+
+
+def record_completed_session(session):
+    """
+    Push a freshly completed session into every competition it belongs to.
+    Returns (competitive session id, ranked entry) for every board that changed.
+    """
+    board_ids = list(
+        CompetitiveSession.objects.filter(
+            Q(ended_at__isnull=True) | Q(ended_at__gte=session.started_at),
+            test_id=session.test_id,
+            started_at__lte=session.started_at,
+        ).values_list('id', flat=True)
+    )
+    if not board_ids:
+        return []
+
+    avg_time = session.responses.aggregate(Avg('response_time'))['response_time__avg']
+    entry = leaderboard_entry(session, avg_time)
+    changes = []
+    for board_id in board_ids:
+        ranked = leaderboards.record(board_id, entry)
+        if ranked is not None:
+            changes.append((board_id, ranked))
+    return changes
@@ -0,0 +1,89 @@
+import json
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class OpenAICompletionClient:
+    """Chat completions through the OpenAI SDK (OpenRouter by default)"""
+
+    def is_configured(self):
+        return bool(settings.OPENAI_API_KEY)
+
+    def stream(self, messages, model):
+        """Yield the completion text piece by piece as the model produces it"""
+        from openai import OpenAI
+
+        client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.QUIZ_LLM_BASE_URL)
+        for chunk in client.chat.completions.create(model=model, messages=messages, stream=True):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubCompletionClient:
+    """Offline stand-in for the completion API, used in tests and local development"""
+
+    chunk_size = 16
+
+    def is_configured(self):
+        return True
+
+    def stream(self, messages, model):
+        topic = messages[-1]['content']
+        content = json.dumps([
+            {
+                "question": f"Stub question {i + 1} ({len(topic)} chars of prompt)",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "correct": "ABCD"[i % 4],
+            }
+            for i in range(settings.QUIZ_BLITZ_QUESTIONS)
+        ])
+        for start in range(0, len(content), self.chunk_size):
+            yield content[start:start + self.chunk_size]
+
+
+def get_completion_client():
+    return import_string(settings.QUIZ_LLM_CLIENT)()
+
+
+def iter_json_objects(chunks):
+    """
+    Incrementally parse a stream of text containing a JSON array of objects
+    and yield every top-level object as soon as its closing brace arrives.
+
+    Text around the array (prose, code fences) is ignored, and an object
+    that fails to parse is skipped without losing the ones after it.
+    """
+    buffer = []
+    depth = 0
+    in_string = False
+    escaped = False
+
+    for chunk in chunks:
+        for char in chunk:
+            if depth == 0:
+                if char == '{':
+                    depth = 1
+                    buffer = [char]
+                continue
+
+            buffer.append(char)
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(''.join(buffer))
+                    except json.JSONDecodeError:
+                        pass
+                    buffer = []
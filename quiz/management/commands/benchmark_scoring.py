@@ -0,0 +1,62 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from quiz.models import Test, Question, Answer, TestSession, UserResponse
+
+
+class Command(BaseCommand):
+    help = "Measure queries and time spent by TestSession.calculate_score for growing tests"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500],
+                            help="Question counts to benchmark")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'questions':>10} {'queries':>8} {'ms':>10} {'score':>6}")
+        for size in options['sizes']:
+            queries, elapsed, score = self.run_once(size)
+            self.stdout.write(f"{size:>10} {queries:>8} {elapsed * 1000:>10.1f} {score:>6}")
+
+    def run_once(self, size):
+        # Everything is seeded inside a transaction that is rolled back
+        with transaction.atomic():
+            session = self.seed(size)
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                score = session.calculate_score()
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return len(ctx.captured_queries), elapsed, score
+
+    def seed(self, size):
+        user = User.objects.create(username=f"bench-scoring-{size}")
+        test = Test.objects.create(title=f"Scoring benchmark ({size})", creator=user)
+
+        questions = [
+            Question(test=test, text=f"Question {i}", order=i,
+                     question_type=('single', 'multiple', 'open')[i % 3])
+            for i in range(size)
+        ]
+        Question.objects.bulk_create(questions)
+
+        answers = []
+        for question in questions:
+            for j in range(4):
+                answers.append(Answer(question=question, text=f"Option {j}", is_correct=j == 0))
+        Answer.objects.bulk_create(answers)
+
+        session = TestSession.objects.create(test=test, user=user)
+        responses = [UserResponse(session=session, question=question) for question in questions]
+        UserResponse.objects.bulk_create(responses)
+
+        # Pick the correct option for every other question
+        through = UserResponse.selected_answers.through
+        through.objects.bulk_create([
+            through(userresponse_id=response.pk, answer_id=answers[i * 4 + (i % 2)].pk)
+            for i, response in enumerate(responses)
+        ])
+        return session
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.expiry import expire_overdue_sessions
+
+
+class Command(BaseCommand):
+    help = "Expire and score test sessions that ran past their time limit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Keep sweeping every N seconds instead of running once")
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_overdue_sessions(batch_size=options['batch_size'])
+            self.stdout.write(f"Expired {expired} sessions.")
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,145 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from quiz.models import Test, Question, TestSession, UserResponse
+from users.models import FriendRequest
+
+
+# What quiz 0008 and users 0003 added for these lookups
+HOT_INDEXES = (
+    'quiz_testse_user_id_715800_idx',
+    'quiz_testse_test_id_8452b3_idx',
+    'users_frien_to_user_40b48f_idx',
+)
+HOT_CONSTRAINTS = (
+    (UserResponse, 'unique_response_per_question'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed realistic row counts and print the query plans of the hot session "
+        "and response lookups without and with their composite indexes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help="Users to seed")
+        parser.add_argument('--tests', type=int, default=50, help="Tests to seed")
+        parser.add_argument('--sessions', type=int, default=20, help="Sessions per user")
+        parser.add_argument('--questions', type=int, default=20, help="Questions per test, each session answers all of them")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows instead of rolling back")
+
+    def handle(self, *args, **options):
+        # Everything is seeded inside a transaction that is rolled back
+        with transaction.atomic():
+            user, test, session, question = self.seed(options)
+            self.analyze()
+
+            queries = [
+                ('TestSession.create lookup', TestSession.objects.filter(
+                    user=user, test=test, status='in_progress')),
+                ('CompetitiveSession leaderboard/participants', TestSession.objects.filter(
+                    test=test, status__in=TestSession.FINISHED_STATUSES, started_at__gte=session.started_at)),
+                ('UserResponse duplicate check', UserResponse.objects.filter(
+                    session=session, question=question)),
+                ('FriendRequest received', FriendRequest.objects.filter(
+                    to_user=user, status='pending')),
+            ]
+            after = [queryset.explain() for _, queryset in queries]
+
+            # The indexes are dropped in a savepoint that is rolled back right away
+            with transaction.atomic():
+                kept = self.drop_hot_indexes()
+                self.analyze()
+                before = [queryset.explain() for _, queryset in queries]
+                transaction.set_rollback(True)
+            self.analyze()
+
+            for (name, _), plan_before, plan_after in zip(queries, before, after):
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(self.style.MIGRATE_LABEL("  Without the indexes:"))
+                self.stdout.write(plan_before)
+                self.stdout.write(self.style.MIGRATE_LABEL("  With the indexes:"))
+                self.stdout.write(plan_after)
+                self.stdout.write("")
+            for name in kept:
+                self.stdout.write(self.style.WARNING(
+                    f"{name} stays in the plans without indexes, "
+                    f"{connection.vendor} can only drop it by rebuilding the table."
+                ))
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def drop_hot_indexes(self):
+        """Drop the indexes and constraints behind the hot lookups, return the ones that had to stay"""
+        quote = connection.ops.quote_name
+        kept = []
+        with connection.cursor() as cursor:
+            for name in HOT_INDEXES:
+                cursor.execute(f"DROP INDEX {quote(name)}")
+            for model, name in HOT_CONSTRAINTS:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f"ALTER TABLE {quote(model._meta.db_table)} DROP CONSTRAINT {quote(name)}")
+                else:
+                    kept.append(name)
+        return kept
+
+    def analyze(self):
+        """Refresh planner statistics so the plans reflect the seeded row counts"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                for model in (TestSession, UserResponse, FriendRequest):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+            elif connection.vendor == 'sqlite':
+                cursor.execute("ANALYZE")
+
+    def seed(self, options):
+        prefix = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(username=f"bench-{prefix}-{i}") for i in range(options['users'])
+        ])
+        tests = Test.objects.bulk_create([
+            Test(id=uuid.uuid4(), title=f"Plan benchmark {i}", creator=users[0])
+            for i in range(options['tests'])
+        ])
+        questions = {
+            test.pk: Question.objects.bulk_create([
+                Question(id=uuid.uuid4(), test=test, text=f"Question {j}", order=j)
+                for j in range(options['questions'])
+            ])
+            for test in tests
+        }
+
+        statuses = ('completed', 'completed', 'completed', 'expired', 'in_progress')
+        sessions = []
+        for i, user in enumerate(users):
+            for j in range(options['sessions']):
+                sessions.append(TestSession(
+                    id=uuid.uuid4(), user=user, test=tests[(i + j) % len(tests)],
+                    status=statuses[(i + j) % len(statuses)],
+                ))
+        TestSession.objects.bulk_create(sessions, batch_size=1000)
+
+        UserResponse.objects.bulk_create([
+            UserResponse(id=uuid.uuid4(), session=session, question=question)
+            for session in sessions
+            for question in questions[session.test_id]
+        ], batch_size=2000)
+
+        FriendRequest.objects.bulk_create([
+            FriendRequest(from_user=users[i], to_user=users[(i + k) % len(users)],
+                          status=('pending', 'accepted', 'rejected')[k % 3])
+            for i in range(len(users))
+            for k in range(1, 6)
+        ], batch_size=1000)
+
+        self.stdout.write(
+            f"Seeded {len(users)} users, {len(sessions)} sessions and "
+            f"{len(sessions) * options['questions']} responses\n"
+        )
+        session = sessions[0]
+        return session.user, session.test, session, questions[session.test_id][0]
@@ -0,0 +1,53 @@
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.exports import FORMATS, TABLES, available_formats, default_format, export_filename, iter_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export test sessions and responses, with their selected answer ids, "
+        "as Parquet, Arrow or CSV files for offline analysis"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(FORMATS), default=default_format(),
+                            help="Parquet and Arrow need pyarrow, CSV is the default without it")
+        parser.add_argument('--output', default='.',
+                            help="Directory the files are written to")
+        parser.add_argument('--table', action='append', dest='tables', choices=list(TABLES),
+                            help="Only export these tables, can be repeated")
+        parser.add_argument('--test', default=None, metavar='TEST_ID',
+                            help="Only export the sessions of this test")
+        parser.add_argument('--chunk-size', type=int, default=settings.QUIZ_EXPORT_CHUNK_SIZE,
+                            help="Rows read and written at a time")
+
+    def handle(self, *args, **options):
+        file_format = options['format']
+        if file_format not in available_formats():
+            raise CommandError(f"Exporting {file_format} needs pyarrow, install it or use --format csv.")
+
+        test_id = options['test']
+        if test_id is not None:
+            try:
+                test_id = uuid.UUID(test_id)
+            except ValueError:
+                raise CommandError(f"--test must be a test id, got {test_id!r}.")
+
+        os.makedirs(options['output'], exist_ok=True)
+        for table in options['tables'] or list(TABLES):
+            path = os.path.join(options['output'], export_filename(table, file_format))
+            started = time.perf_counter()
+            with open(path, 'wb') as file:
+                for data in iter_export(table, file_format, test_id=test_id,
+                                        chunk_size=options['chunk_size']):
+                    file.write(data)
+            self.stdout.write(
+                f"{table}: {os.path.getsize(path)} bytes in {time.perf_counter() - started:.1f}s -> {path}"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Export finished."))
@@ -0,0 +1,231 @@
+import json
+import math
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from config.metrics import registry
+from quiz.models import Test, Question, Answer, CompetitiveSession
+from users.models import UserProfile
+
+# Step name -> endpoint name used by the metrics middleware
+ENDPOINTS = {
+    'join': 'quiz.CompetitiveSessionViewSet.join',
+    'submit_response': 'quiz.TestSessionViewSet.submit_response',
+    'complete': 'quiz.TestSessionViewSet.complete',
+    'leaderboard': 'quiz.CompetitiveSessionViewSet.leaderboard',
+}
+
+METRIC_LINE = re.compile(r'^http_endpoint_(requests_total|queries_total)\{endpoint="([^"]+)"\} (\S+)$')
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = math.ceil(p / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a live competitive event: seed users, a test and a competition, then drive "
+        "join, submit_response, complete and leaderboard concurrently and report latency, "
+        "throughput and queries per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help="Participants to simulate")
+        parser.add_argument('--questions', type=int, default=10, help="Questions in the competition test")
+        parser.add_argument('--concurrency', type=int, default=10, help="Participants running at the same time. SQLite serializes writers, "
+                                 "keep this at 1 there for a clean baseline")
+        parser.add_argument('--base-url',
+                            help="Drive a running server, e.g. http://localhost:8000, instead of calling "
+                                 "the routes in process. The server must use the same database.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the answers participants pick")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded users, test and competition")
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/') if options['base_url'] else None
+        prefix = f"load-{uuid.uuid4().hex[:8]}"
+        tokens, competition, questions = self.seed(prefix, options['users'], options['questions'])
+        self.stdout.write(
+            f"Seeded {len(tokens)} users and a {len(questions)} question competition ({competition.pk})"
+        )
+
+        try:
+            before = self.metrics_snapshot()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                runs = executor.map(
+                    lambda args: self.run_participant(*args),
+                    [(token, competition.pk, questions, random.Random(options['seed'] + i))
+                     for i, token in enumerate(tokens)]
+                )
+                samples = [sample for run in runs for sample in run]
+            elapsed = time.perf_counter() - started
+            after = self.metrics_snapshot()
+
+            self.report(samples, elapsed, before, after, options['concurrency'])
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=prefix).delete()
+
+    @transaction.atomic
+    def seed(self, prefix, user_count, question_count):
+        password = make_password(None)
+        owner = User.objects.create(username=f"{prefix}-owner", password=password)
+        users = User.objects.bulk_create([
+            User(username=f"{prefix}-{i}", password=password) for i in range(user_count)
+        ])
+        # Bulk inserts skip the signal that creates profiles
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+        tokens = Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+
+        test = Test.objects.create(
+            title=f"Load test ({prefix})", creator=owner, mode='competitive',
+            question_count=question_count, total_points=question_count
+        )
+        questions = Question.objects.bulk_create([
+            Question(id=uuid.uuid4(), test=test, text=f"Question {i}", question_type='single', order=i)
+            for i in range(question_count)
+        ])
+        answers = Answer.objects.bulk_create([
+            Answer(id=uuid.uuid4(), question=question, text=f"Option {j}", is_correct=j == 0)
+            for question in questions
+            for j in range(4)
+        ])
+
+        competition = CompetitiveSession.objects.create(
+            test=test, created_by=owner, started_at=timezone.now(), is_active=True
+        )
+        options = defaultdict(list)
+        for answer in answers:
+            options[answer.question_id].append(str(answer.pk))
+        return (
+            [token.key for token in tokens],
+            competition,
+            [(str(question.pk), options[question.pk]) for question in questions],
+        )
+
+    def request(self, method, path, token, data=None):
+        if self.base_url is None:
+            # Server errors are recorded as samples instead of being raised
+            client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+            headers = {'HTTP_AUTHORIZATION': f"Token {token}"}
+            if method == 'post':
+                response = client.post(path, data or {}, content_type='application/json', **headers)
+            else:
+                response = client.get(path, **headers)
+            is_json = response.get('Content-Type', '').startswith('application/json')
+            return response.status_code, response.json() if is_json else None
+
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(data or {}).encode() if method == 'post' else None,
+            method=method.upper(),
+            headers={'Authorization': f"Token {token}", 'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as error:
+            return error.code, None
+
+    def timed(self, samples, step, method, path, token, data=None):
+        started = time.perf_counter()
+        try:
+            status, body = self.request(method, path, token, data)
+        except Exception as exc:  # noqa: BLE001 - a failed request is a sample, not a crash
+            status, body = type(exc).__name__, None
+        samples.append((step, time.perf_counter() - started, status))
+        return status, body
+
+    def run_participant(self, token, competition_id, questions, rng):
+        """One participant: join, answer every question, complete and read the leaderboard"""
+        samples = []
+        try:
+            status, session = self.timed(samples, 'join', 'post', f"/api/quiz/competitive/{competition_id}/join/", token)
+            if status != 201:
+                return samples
+
+            for question_id, answer_ids in questions:
+                self.timed(samples, 'submit_response', 'post', f"/api/quiz/sessions/{session['id']}/submit_response/", token, {
+                    'question': question_id,
+                    'selected_answer_ids': [rng.choice(answer_ids)],
+                    'response_time': round(rng.uniform(1, 15), 2),
+                })
+
+            self.timed(samples, 'complete', 'post', f"/api/quiz/sessions/{session['id']}/complete/", token)
+            self.timed(samples, 'leaderboard', 'get', f"/api/quiz/competitive/{competition_id}/leaderboard/?limit=10", token)
+            return samples
+        finally:
+            if self.base_url is None:
+                connection.close()
+
+    def metrics_snapshot(self):
+        """endpoint -> (requests, queries) from the metrics registry, or the server's /metrics/"""
+        if self.base_url is None:
+            snapshot = {}
+            for endpoint in ENDPOINTS.values():
+                stats = registry.endpoint(endpoint)
+                snapshot[endpoint] = (stats.get('requests_total', 0), stats.get('queries_total', 0))
+            return snapshot
+
+        try:
+            with urllib.request.urlopen(self.base_url + '/metrics/', timeout=10) as response:
+                text = response.read().decode()
+        except (urllib.error.URLError, OSError):
+            return None
+
+        totals = defaultdict(lambda: [0, 0])
+        for line in text.splitlines():
+            match = METRIC_LINE.match(line)
+            if match:
+                metric, endpoint, value = match.groups()
+                totals[endpoint][0 if metric == 'requests_total' else 1] = float(value)
+        return {endpoint: tuple(values) for endpoint, values in totals.items()}
+
+    def report(self, samples, elapsed, before, after, concurrency):
+        by_step = defaultdict(list)
+        errors = defaultdict(int)
+        for step, seconds, status in samples:
+            by_step[step].append(seconds)
+            if not isinstance(status, int) or status >= 400:
+                errors[step] += 1
+
+        self.stdout.write(
+            f"\n{'endpoint':<16} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'queries/req':>11}"
+        )
+        for step, endpoint in ENDPOINTS.items():
+            latencies = sorted(by_step.get(step, []))
+            queries = '-'
+            if before is not None and after is not None and endpoint in after:
+                requests_done = after[endpoint][0] - before.get(endpoint, (0, 0))[0]
+                queries_done = after[endpoint][1] - before.get(endpoint, (0, 0))[1]
+                if requests_done:
+                    queries = f"{queries_done / requests_done:.1f}"
+            self.stdout.write(
+                f"{step:<16} {len(latencies):>8} {errors[step]:>6} "
+                f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f} "
+                f"{percentile(latencies, 99) * 1000:>9.1f} {queries:>11}"
+            )
+
+        self.stdout.write(
+            f"\n{len(samples)} requests in {elapsed:.2f}s at concurrency {concurrency}: "
+            f"{len(samples) / elapsed if elapsed else 0:.1f} req/s, {sum(errors.values())} errors"
+        )
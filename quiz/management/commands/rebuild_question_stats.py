@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from quiz.analytics import rebuild_test_stats
+from quiz.models import Test, TestSession
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-question analytics rollups from finished sessions, one test at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--test', action='append', dest='tests', metavar='TEST_ID',
+                            help="Only rebuild these tests, can be repeated")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Responses loaded per query")
+
+    def handle(self, *args, **options):
+        tests = Test.objects.filter(sessions__status__in=TestSession.FINISHED_STATUSES).distinct()
+        if options['tests']:
+            tests = Test.objects.filter(id__in=options['tests'])
+
+        rebuilt = 0
+        for test in tests.only('id', 'total_points').iterator():
+            questions = rebuild_test_stats(test, chunk_size=options['chunk_size'])
+            self.stdout.write(f"{test.pk}: {questions} questions")
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt analytics for {rebuilt} tests."))
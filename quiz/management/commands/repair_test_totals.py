@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from quiz.models import Test
+
+
+class Command(BaseCommand):
+    help = "Recompute Test.question_count and Test.total_points where they drifted from the questions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the tests that are out of date")
+
+    def handle(self, *args, **options):
+        stale = list(
+            Test.objects.annotate(
+                actual_count=Count('questions'),
+                actual_points=Coalesce(Sum('questions__points'), 0),
+            )
+            .exclude(question_count=F('actual_count'), total_points=F('actual_points'))
+            .values_list('id', 'title', 'question_count', 'actual_count', 'total_points', 'actual_points')
+        )
+
+        for test_id, title, count, actual_count, points, actual_points in stale:
+            self.stdout.write(
+                f"{test_id} {title}: questions {count} -> {actual_count}, points {points} -> {actual_points}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(stale)} tests out of date.")
+            return
+
+        repaired = Test.objects.filter(id__in=[row[0] for row in stale]).refresh_question_totals()
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} tests."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz.jobs import claim_next, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            run_job(job)
+            self.stdout.write(f"{job.kind} {job.pk}: {job.status}")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 17:32
+
+import random
+
+from django.db import migrations, models
+import quiz.models
+
+
+def seed_sessions(apps, schema_editor):
+    """AddField evaluates the default once, give every existing session its own seed"""
+    TestSession = apps.get_model('quiz', 'TestSession')
+    batch = []
+    for session in TestSession.objects.only('id').iterator(chunk_size=1000):
+        session.shuffle_seed = random.getrandbits(31)
+        batch.append(session)
+        if len(batch) >= 1000:
+            TestSession.objects.bulk_update(batch, ['shuffle_seed'])
+            batch = []
+    if batch:
+        TestSession.objects.bulk_update(batch, ['shuffle_seed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='shuffle_seed',
+            field=models.PositiveIntegerField(default=quiz.models.new_shuffle_seed, editable=False),
+        ),
+        migrations.RunPython(seed_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_testsession_shuffle_seed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='sync_seq',
+            field=models.PositiveIntegerField(default=0, help_text='Last client batch applied by sync'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 17:38
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    TestSession = apps.get_model('quiz', 'TestSession')
+    sessions = list(
+        TestSession.objects.filter(status='in_progress', test__time_limit__isnull=False)
+        .select_related('test')
+    )
+    for session in sessions:
+        session.expires_at = session.started_at + timedelta(seconds=session.test.time_limit)
+    TestSession.objects.bulk_update(sessions, ['expires_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_testsession_sync_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text="Deadline derived from the test's time limit", null=True),
+        ),
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(fields=['status', 'expires_at'], name='quiz_testse_status_8c41e8_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
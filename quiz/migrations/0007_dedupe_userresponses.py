@@ -0,0 +1,47 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def delete_duplicate_responses(apps, schema_editor):
+    """
+    Keep one response per (session, question) so the unique constraint can be added.
+
+    Duplicates came from the same answer posted twice racing past the old
+    exists() check, and responses carry no submission time, so there is no
+    "last" row to pick. Keep a row that holds an answer over an empty one,
+    then the highest pk, so every run keeps the same row.
+    """
+    UserResponse = apps.get_model('quiz', 'UserResponse')
+    Selection = UserResponse.selected_answers.through
+    duplicates = (
+        UserResponse.objects.order_by().values('session_id', 'question_id')
+        .annotate(n=Count('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates.iterator():
+        responses = list(
+            UserResponse.objects.filter(session_id=row['session_id'], question_id=row['question_id'])
+            .values_list('id', 'open_response')
+        )
+        answered = set(
+            Selection.objects.filter(userresponse_id__in=[pk for pk, _ in responses])
+            .values_list('userresponse_id', flat=True)
+        )
+        keep = max(
+            responses,
+            key=lambda response: (response[0] in answered or bool(response[1]), str(response[0]))
+        )[0]
+        UserResponse.objects.filter(
+            id__in=[pk for pk, _ in responses if pk != keep]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_testsession_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_responses, migrations.RunPython.noop),
+    ]
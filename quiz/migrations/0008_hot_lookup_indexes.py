@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_dedupe_userresponses'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(fields=['user', 'test', 'status'], name='quiz_testse_user_id_715800_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(fields=['test', 'status', 'started_at'], name='quiz_testse_test_id_8452b3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userresponse',
+            constraint=models.UniqueConstraint(fields=('session', 'question'), name='unique_response_per_question'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 17:41
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_question_totals(apps, schema_editor):
+    Test = apps.get_model('quiz', 'Test')
+    Question = apps.get_model('quiz', 'Question')
+    questions = Question.objects.filter(test=models.OuterRef('pk')).order_by().values('test')
+    Test.objects.update(
+        question_count=Coalesce(models.Subquery(questions.annotate(n=models.Count('id')).values('n')), 0),
+        total_points=Coalesce(models.Subquery(questions.annotate(total=models.Sum('points')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='test',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='total_points',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_question_totals, migrations.RunPython.noop),
+    ]
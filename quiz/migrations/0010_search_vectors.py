@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-18 17:47
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Triggers keep search_vector in step on every write path, bulk inserts
+# included. The text search configuration must match quiz.search.SEARCH_CONFIG.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE FUNCTION quiz_test_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER quiz_test_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description ON quiz_test
+    FOR EACH ROW EXECUTE FUNCTION quiz_test_search_vector_update()
+    """,
+    """
+    CREATE FUNCTION quiz_question_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('english', coalesce(NEW.text, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER quiz_question_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF text ON quiz_question
+    FOR EACH ROW EXECUTE FUNCTION quiz_question_search_vector_update()
+    """,
+    # Fire the triggers once for the existing rows
+    "UPDATE quiz_test SET title = title",
+    "UPDATE quiz_question SET text = text",
+    "CREATE INDEX quiz_test_search_vector_gin ON quiz_test USING GIN (search_vector)",
+    "CREATE INDEX quiz_question_search_vector_gin ON quiz_question USING GIN (search_vector)",
+    "CREATE INDEX quiz_test_title_trgm ON quiz_test USING GIN (title gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS quiz_test_title_trgm",
+    "DROP INDEX IF EXISTS quiz_question_search_vector_gin",
+    "DROP INDEX IF EXISTS quiz_test_search_vector_gin",
+    "DROP TRIGGER IF EXISTS quiz_question_search_vector_trigger ON quiz_question",
+    "DROP FUNCTION IF EXISTS quiz_question_search_vector_update()",
+    "DROP TRIGGER IF EXISTS quiz_test_search_vector_trigger ON quiz_test",
+    "DROP FUNCTION IF EXISTS quiz_test_search_vector_update()",
+]
+
+
+def run_on_postgres(statements):
+    """Search vectors and trigram indexes only exist on Postgres, other databases use the icontains fallback"""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_test_question_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 17:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import quiz.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_search_vectors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('graded', models.PositiveIntegerField(default=0, help_text="Attempts graded automatically, open questions aren't")),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('timed', models.PositiveIntegerField(default=0, help_text='Attempts that reported a response time')),
+                ('response_time_sum', models.FloatField(default=0)),
+                ('response_time_histogram', models.JSONField(default=quiz.models.empty_response_time_histogram)),
+                ('option_counts', models.JSONField(default=dict, help_text='Answer id -> times selected')),
+                ('score_sum', models.FloatField(default=0)),
+                ('score_sq_sum', models.FloatField(default=0)),
+                ('correct_score_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
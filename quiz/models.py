@@ -1,9 +1,27 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+import bisect
 import uuid
 import random
 
 
+class TestQuerySet(models.QuerySet):
+    def refresh_question_totals(self):
+        """Recompute ``question_count`` and ``total_points`` from the questions in one UPDATE"""
+        questions = Question.objects.filter(test=models.OuterRef('pk')).order_by().values('test')
+        return self.update(
+            question_count=Coalesce(models.Subquery(questions.annotate(n=models.Count('id')).values('n')), 0),
+            total_points=Coalesce(models.Subquery(questions.annotate(total=models.Sum('points')).values('total')), 0),
+        )
+
+
 class Test(models.Model):
     MODES = (
         ('normal', 'Normal'),
@@ -22,45 +40,78 @@ class Test(models.Model):
     shuffle_answers = models.BooleanField(default=False)
     mode = models.CharField(max_length=20, choices=MODES, default='normal')
     is_active = models.BooleanField(default=True)
+    question_count = models.PositiveIntegerField(default=0, editable=False)
+    total_points = models.IntegerField(default=0, editable=False)
+    # Maintained by a database trigger on Postgres, see quiz/search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = TestQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-    def get_shuffled_questions(self):
-        questions = list(self.questions.all())
+    def get_shuffled_questions(self, seed=None):
+        questions = list(self.questions.order_by('order', 'id'))
         if self.shuffle_questions:
-            random.shuffle(questions)
+            random.Random(seed).shuffle(questions)
         return questions
 
     def create_variant(self):
         """Create a new variant of this test with rearranged questions"""
-        new_test = Test.objects.create(
-            title=f"{self.title} (Variant)",
-            description=self.description,
-            creator=self.creator,
-            time_limit=self.time_limit,
-            shuffle_questions=True,
-            shuffle_answers=True,
-            mode=self.mode
-        )
-
-        # Copy all questions and answers
-        for question in self.questions.all():
-            new_question = Question.objects.create(
-                test=new_test,
-                text=question.text,
-                question_type=question.question_type,
-                points=question.points
+        return self.create_variants(1)[0]
+
+    def create_variants(self, count):
+        """
+        Create ``count`` variants of this test with rearranged questions.
+        Everything is copied with one prefetch and three bulk inserts.
+        """
+        questions = list(self.questions.prefetch_related('answers'))
+
+        variants = []
+        new_questions = []
+        new_answers = []
+        for n in range(1, count + 1):
+            variant = Test(
+                id=uuid.uuid4(),
+                title=f"{self.title} (Variant)" if count == 1 else f"{self.title} (Variant {n})",
+                description=self.description,
+                creator=self.creator,
+                time_limit=self.time_limit,
+                shuffle_questions=True,
+                shuffle_answers=True,
+                mode=self.mode,
+                # Bulk inserts skip the question signals, carry the totals over
+                question_count=len(questions),
+                total_points=sum(question.points for question in questions)
             )
-
-            for answer in question.answers.all():
-                Answer.objects.create(
-                    question=new_question,
-                    text=answer.text,
-                    is_correct=answer.is_correct
+            variants.append(variant)
+
+            # Copy all questions and answers
+            for question in questions:
+                new_question = Question(
+                    id=uuid.uuid4(),
+                    test=variant,
+                    text=question.text,
+                    question_type=question.question_type,
+                    points=question.points,
+                    order=question.order
                 )
+                new_questions.append(new_question)
 
-        return new_test
+                for answer in question.answers.all():
+                    new_answers.append(Answer(
+                        id=uuid.uuid4(),
+                        question=new_question,
+                        text=answer.text,
+                        is_correct=answer.is_correct
+                    ))
+
+        with transaction.atomic():
+            Test.objects.bulk_create(variants)
+            Question.objects.bulk_create(new_questions, batch_size=1000)
+            Answer.objects.bulk_create(new_answers, batch_size=1000)
+
+        return variants
 
 
 class Question(models.Model):
@@ -76,14 +127,24 @@ class Question(models.Model):
     question_type = models.CharField(max_length=20, choices=QUESTION_TYPES)
     points = models.IntegerField(default=1)
     order = models.IntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return f"{self.text[:50]}..."
 
-    def get_shuffled_answers(self):
+    def get_shuffled_answers(self, shuffle=None, seed=None):
+        """
+        Return the answers, shuffled when the test asks for it. Passing
+        ``shuffle`` avoids loading the test, passing ``seed`` makes the
+        order reproducible.
+        """
         answers = list(self.answers.all())
-        if self.test.shuffle_answers:
-            random.shuffle(answers)
+        if shuffle is None:
+            shuffle = self.test.shuffle_answers
+        if shuffle:
+            if seed is not None:
+                answers.sort(key=lambda answer: answer.pk)
+            random.Random(seed).shuffle(answers)
         return answers
 
 
@@ -97,12 +158,22 @@ class Answer(models.Model):
         return f"{self.text[:50]}..."
 
 
+def new_shuffle_seed():
+    return random.getrandbits(31)
+
+
+def question_order_version_key(test_id):
+    return f"quiz:question-order-version:{test_id}"
+
+
 class TestSession(models.Model):
     STATUS_CHOICES = (
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
         ('expired', 'Expired'),
     )
+    # Statuses that count towards profiles, analytics and leaderboards
+    FINISHED_STATUSES = ('completed', 'expired')
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='sessions')
@@ -111,21 +182,79 @@ class TestSession(models.Model):
     completed_at = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
     score = models.IntegerField(null=True, blank=True)
+    shuffle_seed = models.PositiveIntegerField(default=new_shuffle_seed, editable=False)
+    sync_seq = models.PositiveIntegerField(default=0, help_text="Last client batch applied by sync")
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Deadline derived from the test's time limit")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+            models.Index(fields=['user', 'test', 'status']),
+            models.Index(fields=['test', 'status', 'started_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.test.title}"
 
+    def save(self, *args, **kwargs):
+        # Store the deadline on the session so checks don't have to load the test
+        if self._state.adding and self.expires_at is None and self.test.time_limit:
+            self.expires_at = timezone.now() + timedelta(seconds=self.test.time_limit)
+        super().save(*args, **kwargs)
+
+    def is_overdue(self, now=None):
+        """Whether the time limit, plus a grace period for slow networks, has passed"""
+        if self.expires_at is None:
+            return False
+        now = now or timezone.now()
+        return now > self.expires_at + timedelta(seconds=settings.QUIZ_TIME_LIMIT_GRACE)
+
+    def get_question_order(self):
+        """
+        Ids of the test's questions in the order this session sees them.
+        The order is derived from ``shuffle_seed``, so it survives reconnects
+        and is cached instead of being recomputed for every page. The cache
+        key carries a per-test version that question changes bump.
+        """
+        from django.core.cache import cache
+
+        version = cache.get_or_set(question_order_version_key(self.test_id), lambda: uuid.uuid4().hex, timeout=None)
+        cache_key = f"quiz:session-order:{self.pk}:{self.shuffle_seed}:{version}"
+        order = cache.get(cache_key)
+        if order is None:
+            order = list(
+                Question.objects.filter(test_id=self.test_id)
+                .order_by('order', 'id')
+                .values_list('id', flat=True)
+            )
+            if self.test.shuffle_questions:
+                random.Random(self.shuffle_seed).shuffle(order)
+            cache.set(cache_key, order, timeout=self.test.time_limit or 60 * 60 * 24)
+        return order
+
+    def get_questions_page(self, offset, limit):
+        """Load one page of questions in session order, with their answers in session order"""
+        page_ids = self.get_question_order()[offset:offset + limit]
+        questions = Question.objects.filter(id__in=page_ids).prefetch_related('answers').in_bulk()
+
+        page = []
+        for question_id in page_ids:
+            question = questions.get(question_id)
+            if question is None:
+                continue
+            question.ordered_answers = question.get_shuffled_answers(
+                shuffle=self.test.shuffle_answers,
+                seed=f"{self.shuffle_seed}:{question_id}"
+            )
+            page.append(question)
+        return page
+
     def calculate_score(self):
         """Calculate the score based on the answers provided"""
-        total_points = sum(q.points for q in self.test.questions.all())
-        earned_points = 0
-
-        for response in self.responses.all():
-            if response.is_correct():
-                earned_points += response.question.points
+        from .scoring import grade_sessions
 
-        self.score = earned_points
-        self.save()
+        self.score = grade_sessions([self])[self.pk]
+        self.save(update_fields=['score'])
         return self.score
 
 
@@ -137,26 +266,150 @@ class UserResponse(models.Model):
     open_response = models.TextField(blank=True, null=True)
     response_time = models.FloatField(help_text="Time taken to answer in seconds", null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'question'], name='unique_response_per_question'),
+        ]
+
     def __str__(self):
         return f"Response to {self.question.text[:30]}..."
 
     def is_correct(self):
         """Check if the response is correct based on question type"""
-        if self.question.question_type == 'open':
+        from .answer_keys import get_answer_key
+        from .scoring import is_response_correct
+
+        question_type, _, correct_ids = get_answer_key(self.question.test_id)[self.question_id]
+        if question_type == 'open':
             # For open-ended questions, we'll need manual grading or AI evaluation
             return None
 
-        elif self.question.question_type == 'single':
-            # For single correct answer questions
-            correct_answer = self.question.answers.filter(is_correct=True).first()
-            selected = self.selected_answers.first()
-            return selected == correct_answer
+        selected_ids = [answer.id for answer in self.selected_answers.all()]
+        return is_response_correct(question_type, correct_ids, selected_ids)
+
+
+# Upper bounds in seconds of the response time histogram buckets, the last
+# bucket holds everything slower
+RESPONSE_TIME_BUCKETS = (1, 2, 3, 5, 8, 10, 15, 20, 30, 45, 60, 90, 120, 180, 300)
+
+
+def empty_response_time_histogram():
+    return [0] * (len(RESPONSE_TIME_BUCKETS) + 1)
+
+
+class QuestionStats(models.Model):
+    """
+    Running item statistics of a question over completed sessions. Every
+    field is a sum, so a session is added by incrementing them, see
+    quiz/analytics.py.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    graded = models.PositiveIntegerField(default=0, help_text="Attempts graded automatically, open questions aren't")
+    correct = models.PositiveIntegerField(default=0)
+    timed = models.PositiveIntegerField(default=0, help_text="Attempts that reported a response time")
+    response_time_sum = models.FloatField(default=0)
+    response_time_histogram = models.JSONField(default=empty_response_time_histogram)
+    option_counts = models.JSONField(default=dict, help_text="Answer id -> times selected")
+    # Session score as a share of the test's points, over graded attempts,
+    # for the point-biserial discrimination index
+    score_sum = models.FloatField(default=0)
+    score_sq_sum = models.FloatField(default=0)
+    correct_score_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.question_id}"
 
-        elif self.question.question_type == 'multiple':
-            # For multiple correct answers questions
-            correct_answers = set(self.question.answers.filter(is_correct=True))
-            selected_answers = set(self.selected_answers.all())
-            return correct_answers == selected_answers
+    COUNTER_FIELDS = (
+        'attempts', 'graded', 'correct', 'timed', 'response_time_sum', 'response_time_histogram',
+        'option_counts', 'score_sum', 'score_sq_sum', 'correct_score_sum',
+    )
+
+    def reset(self):
+        for field in self.COUNTER_FIELDS:
+            setattr(self, field, self._meta.get_field(field).get_default())
+
+    def add_response(self, is_correct, selected_ids, response_time, score_share):
+        self.attempts += 1
+        for answer_id in selected_ids:
+            key = str(answer_id)
+            self.option_counts[key] = self.option_counts.get(key, 0) + 1
+
+        if response_time is not None:
+            self.timed += 1
+            self.response_time_sum += response_time
+            self.response_time_histogram[bisect.bisect_left(RESPONSE_TIME_BUCKETS, response_time)] += 1
+
+        if is_correct is not None:
+            self.graded += 1
+            self.score_sum += score_share
+            self.score_sq_sum += score_share ** 2
+            if is_correct:
+                self.correct += 1
+                self.correct_score_sum += score_share
+
+    @property
+    def correct_rate(self):
+        """Share of graded attempts answered correctly, the item's difficulty index"""
+        return self.correct / self.graded if self.graded else None
+
+    @property
+    def mean_response_time(self):
+        return self.response_time_sum / self.timed if self.timed else None
+
+    def response_time_percentile(self, percentile):
+        """Estimate a response time percentile by interpolating inside its histogram bucket"""
+        if not self.timed:
+            return None
+        target = percentile / 100 * self.timed
+        seen = 0
+        for i, count in enumerate(self.response_time_histogram):
+            if count and seen + count >= target:
+                lower = RESPONSE_TIME_BUCKETS[i - 1] if i > 0 else 0
+                if i == len(RESPONSE_TIME_BUCKETS):
+                    return float(lower)
+                return lower + (RESPONSE_TIME_BUCKETS[i] - lower) * (target - seen) / count
+            seen += count
+        return float(RESPONSE_TIME_BUCKETS[-1])
+
+    @property
+    def discrimination(self):
+        """
+        Point-biserial correlation between answering correctly and the
+        session score: high when strong students get the question right
+        and weak ones don't.
+        """
+        n, n_correct = self.graded, self.correct
+        if n < 2 or n_correct in (0, n):
+            return None
+        mean = self.score_sum / n
+        variance = self.score_sq_sum / n - mean ** 2
+        if variance <= 1e-12:
+            return None
+        mean_correct = self.correct_score_sum / n_correct
+        mean_incorrect = (self.score_sum - self.correct_score_sum) / (n - n_correct)
+        p = n_correct / n
+        return (mean_correct - mean_incorrect) / variance ** 0.5 * (p * (1 - p)) ** 0.5
+
+
+class CompetitiveSessionQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Active competitions and the ones ``user`` created"""
+        return self.filter(models.Q(is_active=True) | models.Q(created_by=user))
+
+    def with_participants_count(self):
+        """Annotate ``num_participants`` with one correlated subquery instead of a query per row"""
+        participants = TestSession.objects.filter(
+            test=models.OuterRef('test'),
+            started_at__gte=models.OuterRef('started_at'),
+            started_at__lte=models.OuterRef('ended_at')
+        ).order_by().values('test').annotate(
+            count=models.Count('user', distinct=True)
+        ).values('count')
+        return self.annotate(
+            num_participants=Coalesce(models.Subquery(participants), 0)
+        )
 
 
 class CompetitiveSession(models.Model):
@@ -168,34 +421,101 @@ class CompetitiveSession(models.Model):
     ended_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = CompetitiveSessionQuerySet.as_manager()
+
     def __str__(self):
         return f"Competition: {self.test.title}"
 
     def get_participants(self):
         return User.objects.filter(test_sessions__test=self.test,
                                    test_sessions__started_at__gte=self.started_at,
-                                   test_sessions__started_at__lte=self.ended_at)
+                                   test_sessions__started_at__lte=self.ended_at).distinct()
 
     def get_leaderboard(self):
-        """Get the leaderboard for this competitive session"""
+        """Get the leaderboard for this competitive session, keeping each user's best result"""
+        from .leaderboards import leaderboard_entry, sort_key
+
         sessions = TestSession.objects.filter(
             test=self.test,
             started_at__gte=self.started_at,
-            started_at__lte=self.ended_at,
-            status='completed'
-        ).select_related('user')
+            status__in=TestSession.FINISHED_STATUSES
+        ).select_related('user').annotate(avg_response_time=models.Avg('responses__response_time'))
+        if self.ended_at:
+            sessions = sessions.filter(started_at__lte=self.ended_at)
 
-        leaderboard = []
+        best = {}
         for session in sessions:
-            # Calculate average response time
-            avg_time = session.responses.aggregate(models.Avg('response_time'))['response_time__avg'] or 0
-
-            leaderboard.append({
-                'user': session.user,
-                'score': session.score,
-                'completion_time': (session.completed_at - session.started_at).total_seconds(),
-                'avg_response_time': avg_time
-            })
+            entry = leaderboard_entry(session, session.avg_response_time)
+            current = best.get(entry['user_id'])
+            if current is None or sort_key(entry) < sort_key(current):
+                best[entry['user_id']] = entry
 
         # Sort by score (descending) and then by completion time (ascending)
-        return sorted(leaderboard, key=lambda x: (-x['score'], x['completion_time']))
+        return sorted(best.values(), key=sort_key)
+
+
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_answer_key(sender, instance, **kwargs):
+    """Drop the cached answer key when a question changes"""
+    from .answer_keys import invalidate_answer_key
+
+    invalidate_answer_key(instance.test_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_order(sender, instance, **kwargs):
+    """Sessions of the test pick up added, removed or reordered questions on their next page"""
+    from django.core.cache import cache
+
+    version_key = question_order_version_key(instance.test_id)
+    cache.delete(version_key)
+    # Readers may cache the old order under a new version until the change is committed
+    transaction.on_commit(lambda: cache.delete(version_key))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def update_test_question_totals(sender, instance, **kwargs):
+    """Keep ``Test.question_count`` and ``Test.total_points`` in step with the questions"""
+    Test.objects.filter(pk=instance.test_id).refresh_question_totals()
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_answer_answer_key(sender, instance, **kwargs):
+    """Drop the cached answer key when an answer changes"""
+    from .answer_keys import invalidate_answer_key
+
+    test_id = Question.objects.filter(pk=instance.question_id).values_list('test_id', flat=True).first()
+    if test_id is not None:
+        invalidate_answer_key(test_id)
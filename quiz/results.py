@@ -0,0 +1,33 @@
+from functools import partial
+
+from django.db import transaction
+
+from .analytics import record_session_stats
+from .events import broadcast
+from .leaderboards import record_completed_session
+from .serializers import LeaderboardEntrySerializer
+
+
+def record_finished_sessions(sessions):
+    """
+    Count sessions that were just completed or expired: the profile totals
+    and ratings now and, once the transaction commits, the question rollups
+    and the competition leaderboards. Call it once per session, in the
+    transaction that moved it out of in_progress.
+
+    Profiles are locked in user order so a sweep can't deadlock with a
+    concurrent completion. The rollups lock every stats row of the test, so
+    they wait for the commit: completions of one test at the end of an event
+    then queue on those rows only briefly, not for their whole transaction.
+    A rollup that fails is logged and left to the rebuild_question_stats command.
+    """
+    for session in sorted(sessions, key=lambda session: session.user_id):
+        session.user.profile.record_session(session.score or 0, session.test.total_points)
+    for session in sessions:
+        transaction.on_commit(partial(record_session_stats, session), robust=True)
+        transaction.on_commit(partial(publish_leaderboards, session))
+
+
+def publish_leaderboards(session):
+    for competitive_session_id, entry in record_completed_session(session):
+        broadcast(competitive_session_id, 'leaderboard', LeaderboardEntrySerializer(entry).data)
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import CompetitiveSessionConsumer
+
+websocket_urlpatterns = [
+    path('ws/quiz/competitive/<uuid:pk>/', CompetitiveSessionConsumer.as_asgi()),
+]
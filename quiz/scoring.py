@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from .answer_keys import get_answer_key
+from .models import UserResponse
+
+
+def is_response_correct(question_type, correct_ids, selected_ids):
+    """Grade a single response given the correct and selected answer ids"""
+    if question_type == 'open':
+        # For open-ended questions, we'll need manual grading or AI evaluation
+        return None
+
+    if question_type == 'single':
+        # Compare the first selected answer against the first correct one,
+        # the same way ``.first()`` does with the default pk ordering
+        return min(selected_ids, default=None) == min(correct_ids, default=None)
+
+    if question_type == 'multiple':
+        return set(correct_ids) == set(selected_ids)
+
+    return None
+
+
+def grade_sessions(sessions):
+    """
+    Grade all responses of the given sessions in memory.
+
+    Uses a constant number of queries regardless of how many questions or
+    responses there are: the responses and the selected answers, with answer
+    keys coming from the cache. Returns a dict of session id -> earned points.
+    """
+    sessions = list(sessions)
+    if not sessions:
+        return {}
+
+    answer_keys = {}
+    for session in sessions:
+        if session.test_id not in answer_keys:
+            answer_keys[session.test_id] = get_answer_key(session.test_id)
+
+    session_ids = [session.pk for session in sessions]
+    responses = list(
+        UserResponse.objects.filter(session_id__in=session_ids)
+        .values_list('id', 'session_id', 'question_id')
+    )
+
+    selected = defaultdict(set)
+    for response_id, answer_id in UserResponse.selected_answers.through.objects.filter(
+        userresponse__session_id__in=session_ids
+    ).values_list('userresponse_id', 'answer_id'):
+        selected[response_id].add(answer_id)
+
+    test_ids = {session.pk: session.test_id for session in sessions}
+    scores = dict.fromkeys(session_ids, 0)
+    for response_id, session_id, question_id in responses:
+        entry = answer_keys[test_ids[session_id]].get(question_id)
+        if entry is None:
+            continue
+        question_type, points, correct_ids = entry
+        if is_response_correct(question_type, correct_ids, selected[response_id]):
+            scores[session_id] += points
+
+    return scores
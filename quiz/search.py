@@ -0,0 +1,75 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, Exists, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Question
+
+# Text search configuration the search_vector triggers are built with, see
+# migration 0010_search_vectors
+SEARCH_CONFIG = 'english'
+
+# A matching question counts for less than a match in the test itself,
+# a title that is only similar to the text counts for less still
+QUESTION_RANK_WEIGHT = 0.5
+TRIGRAM_RANK_WEIGHT = 0.1
+
+
+def uses_postgres_search():
+    return connection.vendor == 'postgresql'
+
+
+def search_tests(queryset, text):
+    """
+    Tests matching ``text``, best match first, annotated with ``search_rank``.
+
+    On Postgres the title/description vector and the vectors of the test's
+    questions are searched through their GIN indexes. Tests whose title is
+    only similar to the text, e.g. misspelled, are found through the
+    trigram index. Other databases fall back to ``icontains``.
+    """
+    if not uses_postgres_search():
+        return _search_tests_fallback(queryset, text)
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    matching_questions = Question.objects.filter(test=OuterRef('pk'), search_vector=query)
+    best_question_rank = Subquery(
+        matching_questions.annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank')
+        .values('rank')[:1],
+        output_field=FloatField()
+    )
+
+    return (
+        queryset.filter(
+            Q(search_vector=query)
+            | Q(title__trigram_similar=text)
+            | Exists(matching_questions)
+        )
+        .annotate(search_rank=(
+            Coalesce(SearchRank(F('search_vector'), query), Value(0.0))
+            + QUESTION_RANK_WEIGHT * Coalesce(best_question_rank, Value(0.0))
+            + TRIGRAM_RANK_WEIGHT * TrigramSimilarity('title', text)
+        ))
+        .order_by('-search_rank', '-created_at')
+        .defer('search_vector')
+    )
+
+
+def _search_tests_fallback(queryset, text):
+    matching_questions = Question.objects.filter(test=OuterRef('pk'), text__icontains=text)
+    return (
+        queryset.filter(
+            Q(title__icontains=text)
+            | Q(description__icontains=text)
+            | Exists(matching_questions)
+        )
+        .annotate(search_rank=Case(
+            When(title__icontains=text, then=Value(3)),
+            When(description__icontains=text, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        ))
+        .order_by('-search_rank', '-created_at')
+    )
+
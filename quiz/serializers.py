@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Test, Question, Answer, TestSession, UserResponse, CompetitiveSession
+from .models import Test, Question, Answer, TestSession, UserResponse, CompetitiveSession, Job, QuestionStats
 from django.contrib.auth.models import User
 
 
@@ -20,8 +20,13 @@ class QuestionSerializer(serializers.ModelSerializer):
         fields = ['id', 'text', 'question_type', 'points', 'order', 'answers']
 
 
+class SessionQuestionSerializer(QuestionSerializer):
+    """A question with its answers in the order of a test session"""
+    answers = AnswerSerializer(source='ordered_answers', many=True, read_only=True)
+
+
 class TestSerializer(serializers.ModelSerializer):
-    questions_count = serializers.SerializerMethodField()
+    questions_count = serializers.IntegerField(source='question_count', read_only=True)
 
     class Meta:
         model = Test
@@ -30,9 +35,6 @@ class TestSerializer(serializers.ModelSerializer):
                   'is_active', 'questions_count']
         read_only_fields = ['creator', 'created_at', 'updated_at']
 
-    def get_questions_count(self, obj) -> int:
-        return obj.questions.count()
-
     def create(self, validated_data):
         # Set the creator to the current user
         validated_data['creator'] = self.context['request'].user
@@ -99,6 +101,14 @@ class UserResponseSerializer(serializers.ModelSerializer):
         return response
 
 
+class BatchResponseItemSerializer(serializers.Serializer):
+    """One response of a batch, questions are checked against the answer key instead of per item"""
+    question = serializers.UUIDField()
+    selected_answer_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    open_response = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    response_time = serializers.FloatField(required=False, allow_null=True)
+
+
 class TestSessionSerializer(serializers.ModelSerializer):
     responses = UserResponseSerializer(many=True, read_only=True)
 
@@ -123,6 +133,9 @@ class CompetitiveSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at']
 
     def get_participants_count(self, obj) -> int:
+        count = getattr(obj, 'num_participants', None)
+        if count is not None:
+            return count
         if obj.started_at and obj.ended_at:
             return obj.get_participants().count()
         return 0
@@ -134,7 +147,65 @@ class CompetitiveSessionSerializer(serializers.ModelSerializer):
 
 
 class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
     user = serializers.StringRelatedField()
     score = serializers.IntegerField()
     completion_time = serializers.FloatField()
     avg_response_time = serializers.FloatField()
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+
+class QuestionAnalyticsSerializer(serializers.ModelSerializer):
+    """A question with its rollup statistics, for the test's author"""
+    attempts = serializers.SerializerMethodField()
+    correct_rate = serializers.SerializerMethodField()
+    discrimination = serializers.SerializerMethodField()
+    response_time = serializers.SerializerMethodField()
+    options = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'question_type', 'points', 'order', 'attempts', 'correct_rate',
+                  'discrimination', 'response_time', 'options']
+
+    def _stats(self, obj):
+        try:
+            return obj.stats
+        except QuestionStats.DoesNotExist:
+            return QuestionStats(question=obj)
+
+    def get_attempts(self, obj) -> int:
+        return self._stats(obj).attempts
+
+    def get_correct_rate(self, obj) -> float | None:
+        return self._stats(obj).correct_rate
+
+    def get_discrimination(self, obj) -> float | None:
+        return self._stats(obj).discrimination
+
+    def get_response_time(self, obj) -> dict:
+        stats = self._stats(obj)
+        return {
+            'mean': stats.mean_response_time,
+            'p50': stats.response_time_percentile(50),
+            'p90': stats.response_time_percentile(90),
+            'p99': stats.response_time_percentile(99),
+        }
+
+    def get_options(self, obj) -> list:
+        stats = self._stats(obj)
+        return [
+            {
+                'id': answer.id,
+                'text': answer.text,
+                'is_correct': answer.is_correct,
+                'selected': stats.option_counts.get(str(answer.id), 0),
+            }
+            for answer in obj.answers.all()
+        ]
@@ -0,0 +1,79 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .answer_keys import get_answer_key
+from .models import Answer, UserResponse
+
+
+def submit_responses(session, items, ignore_answered=False, retry=True):
+    """
+    Validate and save a batch of responses for a session.
+
+    ``items`` are validated ``BatchResponseItemSerializer`` dicts. Membership
+    comes from the cached answer key; duplicates and answer ownership are
+    checked with one query each, then responses and their selected answers
+    are bulk inserted. Returns the created responses and a list of
+    ``{"index", "detail"}`` errors for the rejected items. With
+    ``ignore_answered`` questions that already have a response are skipped
+    silently, which makes replaying a batch harmless.
+    """
+    answer_key = get_answer_key(session.test_id)
+    question_ids = {item['question'] for item in items}
+
+    already_answered = set(
+        UserResponse.objects.filter(session=session, question_id__in=question_ids)
+        .values_list('question_id', flat=True)
+    )
+
+    selected_ids = {answer_id for item in items for answer_id in item.get('selected_answer_ids', [])}
+    answer_questions = dict(
+        Answer.objects.filter(id__in=selected_ids).values_list('id', 'question_id')
+    ) if selected_ids else {}
+
+    errors = []
+    responses = []
+    selections = []
+    seen = set()
+    for index, item in enumerate(items):
+        question_id = item['question']
+        if question_id not in answer_key:
+            errors.append({'index': index, 'detail': "This question does not belong to the current test."})
+            continue
+        if question_id in already_answered or question_id in seen:
+            if not ignore_answered:
+                errors.append({'index': index, 'detail': "You have already answered this question."})
+            continue
+
+        answer_ids = item.get('selected_answer_ids', [])
+        if any(answer_questions.get(answer_id) != question_id for answer_id in answer_ids):
+            errors.append({'index': index, 'detail': "Selected answers do not belong to this question."})
+            continue
+
+        seen.add(question_id)
+        response = UserResponse(
+            id=uuid.uuid4(),
+            session=session,
+            question_id=question_id,
+            open_response=item.get('open_response'),
+            response_time=item.get('response_time')
+        )
+        responses.append(response)
+        selections.extend((response.id, answer_id) for answer_id in set(answer_ids))
+
+    through = UserResponse.selected_answers.through
+    try:
+        with transaction.atomic():
+            UserResponse.objects.bulk_create(responses)
+            through.objects.bulk_create([
+                through(userresponse_id=response_id, answer_id=answer_id)
+                for response_id, answer_id in selections
+            ])
+    except IntegrityError:
+        # A concurrent request answered one of these questions after the
+        # duplicate check, run again so it is reported for that item
+        if not retry:
+            raise
+        return submit_responses(session, items, ignore_answered, retry=False)
+
+    return responses, errors
@@ -1,3 +1,510 @@
-from django.test import TestCase
+import csv
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.metrics import registry
+
+from .answer_keys import get_answer_key, load_answer_key
+from .blitz import get_cached_questions, source_topic, stream_blitz_test
+from .chunking import chunked_rows
+from .expiry import expire_overdue_sessions
+from .jobs import claim_next, enqueue, register, run_job
+from .llm import StubCompletionClient, iter_json_objects
+from .models import Test, Question, Answer, TestSession, CompetitiveSession, Job, question_order_version_key
+from .routing import websocket_urlpatterns
+
+
+def make_test(creator, questions=3, title="Test", **kwargs):
+    """A test of single choice questions worth one point each, the first answer is correct"""
+    test = Test.objects.create(title=title, creator=creator, **kwargs)
+    for i in range(questions):
+        question = Question.objects.create(test=test, text=f"Question {i}", question_type='single', order=i)
+        Answer.objects.create(question=question, text="Right", is_correct=True)
+        Answer.objects.create(question=question, text="Wrong")
+    return test
+
+
+def answer_all(client, session, correct=True):
+    for question in session.test.questions.prefetch_related('answers'):
+        answer = question.answers.get(is_correct=correct)
+        response = client.post(f'/api/quiz/sessions/{session.pk}/submit_response/', {
+            'question': str(question.pk),
+            'selected_answer_ids': [str(answer.pk)],
+            'response_time': 1.0,
+        }, format='json')
+        assert response.status_code == 201, response.data
+
+
+class QuestionPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author', password='secret')
+        cls.test = Test.objects.create(title="Long test", creator=cls.user)
+        # More questions sharing one order than DRF's CursorPagination can offset through
+        Question.objects.bulk_create([
+            Question(test=cls.test, text=f"Question {i}", question_type='open')
+            for i in range(1500)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, direction):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.append([question['id'] for question in response.data['results']])
+            url = response.data[direction]
+        return seen
+
+    def test_pages_cover_ties_exactly_once(self):
+        pages = self.walk(f'/api/quiz/tests/{self.test.pk}/questions/?page_size=100', 'next')
+        ids = [question_id for page in pages for question_id in page]
+
+        self.assertEqual(len(pages), 15)
+        self.assertEqual(len(ids), 1500)
+        self.assertEqual(len(set(ids)), 1500)
+        expected = self.test.questions.order_by('order', 'id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(question_id) for question_id in expected])
+
+    def test_previous_walks_back(self):
+        first = self.client.get(f'/api/quiz/tests/{self.test.pk}/questions/?page_size=100')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertEqual(self.client.get(back.data['next']).data['results'], second.data['results'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/quiz/tests/{self.test.pk}/questions/?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+
+    def test_streams_ndjson(self):
+        url = f'/api/quiz/tests/{self.test.pk}/questions/'
+        for response in [self.client.get(url, HTTP_ACCEPT='application/x-ndjson'), self.client.get(f'{url}?stream=true')]:
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1500)
+
+        response = self.client.get(f'{url}?stream=0')
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data['results']), 20)
+
+
+class SessionCompletionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='secret')
+        self.test = make_test(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_complete_records_once(self):
+        session = TestSession.objects.create(user=self.user, test=self.test)
+        answer_all(self.client, session)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = self.client.post(f'/api/quiz/sessions/{session.pk}/complete/')
+        second = self.client.post(f'/api/quiz/sessions/{session.pk}/complete/')
+
+        # Question rollups wait for the completion to commit
+        self.assertFalse(self.test.questions.filter(stats__attempts__gt=0).exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.test.questions.filter(stats__attempts=1).count(), 3)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual((first.data['score'], first.data['total']), (3, 3))
+        self.assertEqual(second.status_code, 400)
+        profile = self.user.profile
+        profile.refresh_from_db()
+        self.assertEqual((profile.tests_taken, profile.points_earned, profile.points_possible), (1, 3, 3))
+
+    def test_added_questions_reach_sessions_in_progress(self):
+        session = TestSession.objects.create(user=self.user, test=self.test)
+        self.assertEqual(self.client.get(f'/api/quiz/sessions/{session.pk}/questions/').data['count'], 3)
+
+        response = self.client.post(f'/api/quiz/tests/{self.test.pk}/add_question/', {
+            'text': "Question 3", 'question_type': 'single', 'order': 3,
+            'answers': [{'text': "Right", 'is_correct': True}, {'text': "Wrong", 'is_correct': False}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.client.get(f'/api/quiz/sessions/{session.pk}/questions/').data['count'], 4)
+
+    def test_order_cached_before_commit_is_dropped(self):
+        session = TestSession.objects.create(user=self.user, test=self.test)
+        stale = session.get_question_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(test=self.test, text="Question 3", question_type='open', order=3)
+            # A concurrent reader still sees the old questions and caches them under the new version
+            session.get_question_order()
+            version = cache.get(question_order_version_key(self.test.pk))
+            cache.set(f"quiz:session-order:{session.pk}:{session.shuffle_seed}:{version}", stale)
+
+        self.assertEqual(len(session.get_question_order()), 4)
+
+    def start_overdue_session(self):
+        Test.objects.filter(pk=self.test.pk).update(time_limit=60)
+        self.test.refresh_from_db()
+        session = TestSession.objects.create(user=self.user, test=self.test)
+        answer_all(self.client, session)
+        TestSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() - timedelta(minutes=5))
+        return session
+
+    def test_complete_rejects_overdue_session(self):
+        session = self.start_overdue_session()
+
+        response = self.client.post(f'/api/quiz/sessions/{session.pk}/complete/')
+
+        self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.score), ('expired', 3))
+        profile = self.user.profile
+        profile.refresh_from_db()
+        self.assertEqual((profile.tests_taken, profile.points_earned, profile.points_possible), (1, 3, 3))
+
+    def test_sweeper_records_expired_sessions(self):
+        session = self.start_overdue_session()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expire_overdue_sessions(), 1)
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'expired')
+        profile = self.user.profile
+        profile.refresh_from_db()
+        self.assertEqual((profile.tests_taken, profile.points_earned), (1, 3))
+        self.assertEqual(session.test.questions.filter(stats__attempts=1).count(), 3)
+
+
+class AnswerKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test = make_test(User.objects.create_user('author', password='secret'), questions=1)
+
+    def test_key_cached_before_commit_is_dropped(self):
+        stale = get_answer_key(self.test.pk)
+        question = self.test.questions.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.answers.update(is_correct=True)
+            question.save()
+            # A concurrent grader still reads the old rows and caches them under the new version
+            with mock.patch('quiz.answer_keys.load_answer_key', return_value=stale):
+                get_answer_key(self.test.pk)
+
+        self.assertEqual(get_answer_key(self.test.pk), load_answer_key(self.test.pk))
+        self.assertNotEqual(get_answer_key(self.test.pk), stale)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('student', password='secret')
+        self.test = make_test(self.user)
+        self.session = TestSession.objects.create(user=self.user, test=self.test)
+        self.questions = list(self.test.questions.order_by('order').prefetch_related('answers'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, seq, questions):
+        return self.client.post(f'/api/quiz/sessions/{self.session.pk}/sync/', {'seq': seq, 'responses': [
+            {'question': str(question.pk), 'selected_answer_ids': [str(question.answers.all()[0].pk)]}
+            for question in questions
+        ]}, format='json')
+
+    def test_applies_batches_out_of_order(self):
+        self.sync(2, self.questions[1:])
+
+        response = self.sync(1, self.questions[:2])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['seq'], 2)
+        self.assertEqual(response.data['created'], [str(self.questions[0].pk)])
+        self.assertEqual(response.data['rejected'], [])
+        self.assertEqual(sorted(response.data['answered']), sorted(str(question.pk) for question in self.questions))
+
+    def test_replay_is_acknowledged(self):
+        self.sync(1, self.questions)
+
+        response = self.sync(1, self.questions)
+
+        self.assertEqual((response.data['created'], response.data['rejected']), ([], []))
+        self.assertEqual(self.session.responses.count(), 3)
+
+    def test_rejects_list_body(self):
+        response = self.client.post(f'/api/quiz/sessions/{self.session.pk}/sync/', [], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        self.test = make_test(self.staff)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_streams_responses_with_selected_answers(self):
+        session = TestSession.objects.create(user=self.staff, test=self.test)
+        answer_all(self.client, session)
+
+        response = self.client.get(f'/api/quiz/exports/responses/?file_format=csv&test={self.test.pk}')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row['selected_answer_ids'] for row in rows))
+
+    def test_rejects_invalid_test_before_streaming(self):
+        response = self.client.get('/api/quiz/exports/sessions/?file_format=csv&test=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+
+        with self.assertRaises(CommandError):
+            call_command('export_responses', format='csv', test='abc', stdout=io.StringIO())
+
+    def test_staff_only(self):
+        student = User.objects.create_user('student', password='secret')
+        self.client.force_authenticate(student)
+        self.assertEqual(self.client.get('/api/quiz/exports/sessions/').status_code, 403)
+
+
+class ChunkedRowsTests(TestCase):
+    def setUp(self):
+        self.test = make_test(User.objects.create_user('author'), questions=7)
+        self.rows = Question.objects.filter(test=self.test).values_list('id', 'text')
+
+    def test_server_side_cursor(self):
+        chunks = list(chunked_rows(self.rows, 3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+
+    def test_keyset_without_server_side_cursors(self):
+        settings_dict = connection.settings_dict
+        settings_dict['DISABLE_SERVER_SIDE_CURSORS'] = True
+        try:
+            chunks = list(chunked_rows(self.rows, 3))
+        finally:
+            settings_dict['DISABLE_SERVER_SIDE_CURSORS'] = False
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        ids = [row[0] for chunk in chunks for row in chunk]
+        self.assertEqual(ids, sorted(self.rows.values_list('id', flat=True)))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """Every endpoint in QUERY_BUDGETS, with enough rows that a per-row query would break its budget"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('player', password='secret')
+        self.test = make_test(self.user, questions=12)
+        for i in range(5):
+            make_test(self.user, questions=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tests(self):
+        self.assertEqual(self.client.get('/api/quiz/tests/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/quiz/tests/{self.test.pk}/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/quiz/tests/{self.test.pk}/questions/').status_code, 200)
+        self.assertEqual(self.client.get(f'/api/quiz/tests/{self.test.pk}/analytics/').status_code, 200)
+
+    def test_records_view_time(self):
+        registry.reset()
+        self.client.get('/api/quiz/tests/')
+
+        stats = registry.endpoint('quiz.TestViewSet.list')
+        self.assertEqual(stats['requests_total'], 1)
+        self.assertGreater(stats['view_seconds_total'], 0)
+        self.assertGreater(stats['render_seconds_total'], 0)
+
+    def test_session(self):
+        competition = CompetitiveSession.objects.create(
+            test=self.test, created_by=self.user, started_at=timezone.now()
+        )
+        for i in range(3):
+            rival = User.objects.create_user(f'rival{i}')
+            rival_session = TestSession.objects.create(user=rival, test=self.test)
+            TestSession.objects.filter(pk=rival_session.pk).update(status='completed', score=i, completed_at=timezone.now())
+
+        session = TestSession.objects.create(user=self.user, test=self.test)
+        questions = list(self.test.questions.prefetch_related('answers').order_by('order'))
+        first, rest = questions[0], questions[1:]
+        response = self.client.post(f'/api/quiz/sessions/{session.pk}/submit_response/', {
+            'question': str(first.pk),
+            'selected_answer_ids': [str(first.answers.all()[0].pk)],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(f'/api/quiz/sessions/{session.pk}/submit_responses/', {'responses': [
+            {'question': str(question.pk), 'selected_answer_ids': [str(question.answers.all()[0].pk)]}
+            for question in rest
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(f'/api/quiz/sessions/{session.pk}/complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 12)
+
+        self.assertEqual(self.client.get('/api/quiz/competitive/').status_code, 200)
+        response = self.client.get(f'/api/quiz/competitive/{competition.pk}/leaderboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 4)
+
+
+class CompetitionEventTests(TransactionTestCase):
+    """Websocket fan-out through the in-memory channel layer"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('host', password='secret')
+        self.test = make_test(self.user)
+        self.competition = CompetitiveSession.objects.create(test=self.test, created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/quiz/competitive/{self.competition.pk}/'
+        )
+        communicator.scope['user'] = user
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def test_rejects_anonymous(self):
+        from django.contrib.auth.models import AnonymousUser
+
+        communicator, connected, code = await self.connect(AnonymousUser())
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_rejects_hidden_competition(self):
+        stranger = await sync_to_async(User.objects.create_user)('stranger', password='secret')
+        await sync_to_async(CompetitiveSession.objects.filter(pk=self.competition.pk).update)(is_active=False)
+
+        communicator, connected, code = await self.connect(stranger)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4404)
+
+        communicator, connected, _ = await self.connect(self.user)
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    async def test_broadcasts_start_and_progress(self):
+        communicator, connected, _ = await self.connect(self.user)
+        self.assertTrue(connected)
+        state = await communicator.receive_json_from()
+        self.assertEqual(state['event'], 'state')
+        self.assertIsNone(state['data']['started_at'])
+
+        response = await sync_to_async(self.client.post)(f'/api/quiz/competitive/{self.competition.pk}/start/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((await communicator.receive_json_from())['event'], 'started')
+
+        session = await sync_to_async(TestSession.objects.create)(user=self.user, test=self.test)
+        await sync_to_async(answer_all)(self.client, session)
+        events = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual({event['event'] for event in events}, {'progress'})
+
+        await communicator.disconnect()
+
+
+@override_settings(QUIZ_LLM_CLIENT='quiz.llm.StubCompletionClient', QUIZ_BLITZ_QUESTIONS=5)
+class BlitzGenerationTests(TestCase):
+    """Blitz generation against the offline stub client"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('author', password='secret')
+        self.test = make_test(self.user)
+        self.test.title = f"Stub topic {self.test.pk}"
+        self.test.save(update_fields=['title'])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_generates_in_a_job_then_serves_from_cache(self):
+        response = self.client.post(f'/api/quiz/tests/{self.test.pk}/generate_blitz/')
+        self.assertEqual(response.status_code, 202)
+
+        job = run_job(claim_next())
+        self.assertEqual(job.status, 'completed', job.error)
+        blitz = Test.objects.get(pk=job.result['test'])
+        self.assertEqual((blitz.mode, blitz.question_count, blitz.total_points), ('blitz', 5, 5))
+        self.assertEqual(Answer.objects.filter(question__test=blitz, is_correct=True).count(), 5)
+
+        # The same topic is answered right away from the question cache
+        response = self.client.post(f'/api/quiz/tests/{self.test.pk}/generate_blitz/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Test.objects.get(pk=response.data['id']).question_count, 5)
+        self.assertFalse(Job.objects.filter(status='queued').exists())
+
+    def test_stream_failing_partway_deactivates_the_quiz(self):
+        def stream(client, messages, model):
+            yield '[{"question": "Saved", "options": ["A", "B"], "correct": "A"}, {"quest'
+            raise ConnectionError("stream dropped")
+
+        with mock.patch.object(StubCompletionClient, 'stream', stream):
+            with self.assertRaises(ConnectionError):
+                stream_blitz_test(self.test, self.user, source_topic(self.test))
+
+        blitz = Test.objects.get(mode='blitz')
+        self.assertFalse(blitz.is_active)
+        self.assertEqual(list(blitz.questions.values_list('text', flat=True)), ["Saved"])
+        self.assertIsNone(get_cached_questions(source_topic(self.test)))
+
+    def test_failed_job_keeps_its_progress(self):
+        with mock.patch.dict('quiz.jobs._handlers'):
+            @register('fails_partway')
+            def fails_partway(job):
+                Job.objects.filter(pk=job.pk).update(result={'done': 1})
+                raise RuntimeError("boom")
+
+            enqueue('fails_partway', {})
+            job = run_job(claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn("boom", job.error)
+        self.assertEqual(job.result, {'done': 1})
+
+    def test_iter_json_objects(self):
+        text = 'Sure! ```json [{"question": "a {b}", "n": 1}, {"broken": }, {"question": "c\\\\"}] ```'
+        chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+        self.assertEqual(list(iter_json_objects(chunks)), [{"question": "a {b}", "n": 1}, {"question": "c\\"}])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('author', password='secret')
+        self.by_title = make_test(self.user, questions=1, title="Photosynthesis basics")
+        self.by_question = make_test(self.user, questions=1, title="Biology")
+        Question.objects.create(test=self.by_question, text="Where does photosynthesis happen?", question_type='open')
+        make_test(self.user, questions=1, title="Algebra")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ranks_title_matches_first(self):
+        response = self.client.get('/api/quiz/tests/search/?q=photosynthesis')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            [test['id'] for test in response.data['results']],
+            [str(self.by_title.pk), str(self.by_question.pk)]
+        )
+
+    def test_requires_query(self):
+        self.assertEqual(self.client.get('/api/quiz/tests/search/?q=').status_code, 400)
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TestViewSet, TestSessionViewSet, CompetitiveSessionViewSet
+from .views import TestViewSet, TestSessionViewSet, CompetitiveSessionViewSet, JobViewSet, ExportViewSet
 
 router = DefaultRouter()
 router.register(r'tests', TestViewSet, basename='test')
 router.register(r'sessions', TestSessionViewSet, basename='test-session')
 router.register(r'competitive', CompetitiveSessionViewSet, basename='competitive-session')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'exports', ExportViewSet, basename='export')
 
 urlpatterns = [
     path('', include(router.urls)),
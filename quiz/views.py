@@ -1,19 +1,35 @@
+import uuid
+
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db import transaction
-import os
-import random
-from openai import OpenAI
+from django.db import IntegrityError, transaction
+from config.pagination import KeysetPagination, SearchPagination
+from .answer_keys import invalidate_answer_key
+from .blitz import create_blitz_test, get_cached_questions, source_topic
+from .events import broadcast, live_competitions, invalidate_live_competitions
+from .expiry import expire_sessions
+from .exports import TABLES, available_formats, content_type, default_format, export_filename, iter_export
+from .jobs import enqueue
+from .leaderboards import leaderboards
+from .llm import get_completion_client
+from .renderers import NDJSONRenderer
+from .results import record_finished_sessions
+from .search import search_tests
+from .submissions import submit_responses
 from .models import (
-    Test, Question, Answer, TestSession,
-    UserResponse, CompetitiveSession
+    Test, TestSession,
+    UserResponse, CompetitiveSession, Job
 )
 from .serializers import (
-    TestSerializer, TestDetailSerializer, QuestionCreateSerializer,
+    TestSerializer, TestDetailSerializer, QuestionSerializer, QuestionCreateSerializer,
     TestSessionSerializer, UserResponseSerializer, CompetitiveSessionSerializer,
-    LeaderboardEntrySerializer
+    LeaderboardEntrySerializer, JobSerializer, SessionQuestionSerializer,
+    BatchResponseItemSerializer, QuestionAnalyticsSerializer
 )
 
 
@@ -31,6 +47,11 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.creator == request.user
 
 
+class QuestionCursorPagination(KeysetPagination):
+    # Questions share an order until they are rearranged, id breaks the ties
+    ordering = ('order', 'id')
+
+
 class TestViewSet(viewsets.ModelViewSet):
     queryset = Test.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
@@ -60,8 +81,68 @@ class TestViewSet(viewsets.ModelViewSet):
             is_active = is_active.lower() == 'true'
             queryset = queryset.filter(is_active=is_active)
 
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('questions__answers')
+
         return queryset
 
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Per-question statistics over completed sessions, for the test's author"""
+        test = self.get_object()
+        if test.creator_id != request.user.id and not request.user.is_staff:
+            return Response(
+                {"detail": "Only the creator of this test can see its analytics."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        questions = (
+            test.questions.select_related('stats')
+            .prefetch_related('answers')
+            .order_by('order', 'id')
+        )
+        return Response({
+            "test": str(test.pk),
+            "questions": QuestionAnalyticsSerializer(questions, many=True).data
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over tests and their questions, best match first, page by page"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({"detail": "The q parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = search_tests(self.get_queryset(), text)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = TestSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'],
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer])
+    def questions(self, request, pk=None):
+        """
+        Get the questions of a test page by page, or all of them as
+        newline-delimited JSON with ``?stream=true`` or ``Accept: application/x-ndjson``
+        """
+        test = self.get_object()
+        questions = test.questions.order_by('order', 'id').prefetch_related('answers')
+
+        stream = request.query_params.get('stream', '').lower() in ('1', 'true')
+        if stream or request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(self._stream_questions(questions), content_type=NDJSONRenderer.media_type)
+
+        paginator = QuestionCursorPagination()
+        page = paginator.paginate_queryset(questions, request, view=self)
+        serializer = QuestionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def _stream_questions(self, questions):
+        # Answers are prefetched once per chunk of questions
+        for question in questions.iterator(chunk_size=100):
+            yield NDJSONRenderer.render_line(QuestionSerializer(question).data)
+
     @action(detail=True, methods=['post'])
     def add_question(self, request, pk=None):
         """Add a question to a test"""
@@ -78,6 +159,7 @@ class TestViewSet(viewsets.ModelViewSet):
         serializer = QuestionCreateSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save(test=test)
+            invalidate_answer_key(test.pk)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -93,14 +175,32 @@ class TestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Create the variant
-        variant = test.create_variant()
-        serializer = TestSerializer(variant)
+        try:
+            count = int(request.data.get('count', 1))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= settings.QUIZ_MAX_VARIANTS:
+            return Response(
+                {"detail": f"count must be between 1 and {settings.QUIZ_MAX_VARIANTS}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Large clones are handed to the job worker
+        if test.question_count * count > settings.QUIZ_VARIANT_ASYNC_THRESHOLD:
+            job = enqueue('create_variants', {'test': str(test.pk), 'count': count}, user=request.user)
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        # Create the variants
+        variants = test.create_variants(count)
+        if count == 1:
+            serializer = TestSerializer(variants[0])
+        else:
+            serializer = TestSerializer(variants, many=True)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'])
     def generate_blitz(self, request, pk=None):
-        """Generate a blitz quiz using ChatGPT based on this test"""
+        """Queue generation of a blitz quiz using ChatGPT based on this test"""
         test = self.get_object()
 
         # Check if the user is the creator of the test
@@ -110,89 +210,22 @@ class TestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Check if OpenAI API key is configured
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
+        # Check if the completion API is configured
+        if not get_completion_client().is_configured():
             return Response(
                 {"detail": "OpenAI API key is not configured."},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
 
-        try:
-            # Get the topic from the test title and description
-            topic = f"{test.title}. {test.description}"
+        # Topics generated recently are served from the cache right away
+        questions_data = get_cached_questions(source_topic(test), record_miss=False)
+        if questions_data is not None:
+            blitz_quiz = create_blitz_test(test, request.user, questions_data)
+            return Response(TestSerializer(blitz_quiz).data, status=status.HTTP_201_CREATED)
 
-            client = OpenAI(
-                api_key="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",
-                base_url="https://openrouter.ai/api/v1"
-            )
-
-            response = client.chat.completions.create(
-                model="openai/gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates quiz questions."},
-                    {"role": "user", "content": f"Generate 20 multiple-choice questions about {topic}. "
-                                                f"For each question, provide 4 options and indicate the correct answer. "
-                                                f"Format as JSON with structure: "
-                                                f"[{{\"question\": \"...\", \"options\": [\"A\", \"B\", \"C\", \"D\"], \"correct\": \"A\"}}] "
-                                                f"Return only the JSON array."}
-                ]
-            )
-
-            generated_content = response.choices[0].message.content
-            import json
-            try:
-                questions_data = json.loads(generated_content)
-            except json.JSONDecodeError:
-                # If the response isn't valid JSON, try to extract it
-                import re
-                json_match = re.search(r'\[\s*\{.*\}\s*\]', generated_content, re.DOTALL)
-                if json_match:
-                    questions_data = json.loads(json_match.group(0))
-                else:
-                    return Response(
-                        {"detail": "Failed to parse generated questions."},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-
-            # Create a new blitz quiz
-            blitz_quiz = Test.objects.create(
-                title=f"Blitz Quiz: {test.title}",
-                description=f"Auto-generated blitz quiz based on {test.title}",
-                creator=request.user,
-                time_limit=600,  # 10 minutes
-                shuffle_questions=True,
-                shuffle_answers=True,
-                mode='blitz'
-            )
-
-            # Add the generated questions
-            for i, q_data in enumerate(questions_data[:20]):  # Limit to 20 questions
-                question = Question.objects.create(
-                    test=blitz_quiz,
-                    text=q_data['question'],
-                    question_type='single',
-                    points=1,
-                    order=i
-                )
-
-                # Add the options
-                for j, option_text in enumerate(q_data['options']):
-                    is_correct = q_data['correct'] == chr(65 + j)  # Convert A, B, C, D to index
-                    Answer.objects.create(
-                        question=question,
-                        text=option_text,
-                        is_correct=is_correct
-                    )
-
-            serializer = TestSerializer(blitz_quiz)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response(
-                {"detail": f"Error generating quiz: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # The model call takes tens of seconds, let the job worker wait for it
+        job = enqueue('generate_blitz', {'test': str(test.pk), 'user': request.user.pk}, user=request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 
 class TestSessionViewSet(viewsets.ModelViewSet):
@@ -201,7 +234,7 @@ class TestSessionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Only allow users to see their own test sessions"""
-        return TestSession.objects.filter(user=self.request.user)
+        return TestSession.objects.filter(user=self.request.user).select_related('test')
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -222,6 +255,10 @@ class TestSessionViewSet(viewsets.ModelViewSet):
             status='in_progress'
         ).first()
 
+        # Sessions past their deadline are expired instead of being resumed
+        if existing_session and self._expire_if_overdue(existing_session):
+            existing_session = None
+
         if existing_session:
             serializer = self.get_serializer(existing_session)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -236,12 +273,24 @@ class TestSessionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(session)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _expire_if_overdue(self, session):
+        """Expire a session past its stored deadline, returns whether it is expired"""
+        if session.status == 'in_progress' and session.is_overdue():
+            expire_sessions([session.pk])
+            session.refresh_from_db(fields=['status', 'completed_at', 'score'])
+        return session.status == 'expired'
+
     @action(detail=True, methods=['post'])
     def submit_response(self, request, pk=None):
         """Submit a response to a question in the test"""
         session = self.get_object()
 
         # Check if the session is still in progress
+        if self._expire_if_overdue(session):
+            return Response(
+                {"detail": "The time limit for this test session has expired."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if session.status != 'in_progress':
             return Response(
                 {"detail": "This test session is no longer active."},
@@ -259,48 +308,223 @@ class TestSessionViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Check if there's already a response for this question
-            if UserResponse.objects.filter(session=session, question_id=question_id).exists():
+            # Save the response, the unique (session, question) constraint
+            # rejects a second answer even when two requests race
+            try:
+                with transaction.atomic():
+                    serializer.save(session=session)
+            except IntegrityError:
                 return Response(
                     {"detail": "You have already answered this question."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Save the response
-            serializer.save(session=session)
+            for competitive_session_id in live_competitions(session.test_id):
+                broadcast(competitive_session_id, 'progress', {
+                    'user': request.user.username,
+                    'session': str(session.pk),
+                    'question': str(question_id),
+                })
+
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
-    def complete(self, request, pk=None):
-        """Complete the test session and calculate the score"""
+    def submit_responses(self, request, pk=None):
+        """Submit several responses at once, reporting errors per item"""
         session = self.get_object()
 
         # Check if the session is still in progress
+        if self._expire_if_overdue(session):
+            return Response(
+                {"detail": "The time limit for this test session has expired."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if session.status != 'in_progress':
             return Response(
-                {"detail": "This test session is already completed."},
+                {"detail": "This test session is no longer active."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        items = request.data.get('responses') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "Expected a non-empty list of responses."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.QUIZ_MAX_BATCH_RESPONSES:
+            return Response(
+                {"detail": f"At most {settings.QUIZ_MAX_BATCH_RESPONSES} responses can be submitted at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        valid_items = []
+        valid_indexes = []
+        errors = []
+        for index, item in enumerate(items):
+            serializer = BatchResponseItemSerializer(data=item)
+            if serializer.is_valid():
+                valid_items.append(serializer.validated_data)
+                valid_indexes.append(index)
+            else:
+                errors.append({'index': index, 'detail': serializer.errors})
+
+        created, item_errors = submit_responses(session, valid_items)
+        errors.extend(dict(error, index=valid_indexes[error['index']]) for error in item_errors)
+        errors.sort(key=lambda error: error['index'])
+
+        if created:
+            for competitive_session_id in live_competitions(session.test_id):
+                broadcast(competitive_session_id, 'progress', {
+                    'user': request.user.username,
+                    'session': str(session.pk),
+                    'questions': [str(response.question_id) for response in created],
+                })
+
+        return Response({
+            "created": UserResponseSerializer(created, many=True).data,
+            "errors": errors
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'])
+    def sync(self, request, pk=None):
+        """
+        Merge a client's buffered answers and return the server's state.
+
+        The body is ``{"seq": <int>, "responses": [...]}`` where ``seq`` grows
+        with every batch the client sends. Batches are applied whatever order
+        they arrive in and answers the server already has are acknowledged
+        instead of rejected, so clients can retry freely. The highest ``seq``
+        seen is returned so clients can drop the batches up to it.
+        """
+        if not isinstance(request.data, dict):
+            return Response(
+                {"detail": "Expected a non-negative 'seq' and a list of 'responses'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            seq = int(request.data.get('seq'))
+        except (TypeError, ValueError):
+            seq = -1
+        items = request.data.get('responses', [])
+        if seq < 0 or not isinstance(items, list):
+            return Response(
+                {"detail": "Expected a non-negative 'seq' and a list of 'responses'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.QUIZ_MAX_BATCH_RESPONSES:
+            return Response(
+                {"detail": f"At most {settings.QUIZ_MAX_BATCH_RESPONSES} responses can be synced at once."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Mark as completed
-        session.status = 'completed'
-        session.completed_at = timezone.now()
-        session.save()
+        rejected = []
+        created = []
+        with transaction.atomic():
+            # Concurrent retries of the same session are applied one at a time
+            session = self.get_queryset().select_for_update(of=('self',)).get(pk=self.get_object().pk)
+            self._expire_if_overdue(session)
+
+            if session.status == 'in_progress':
+                valid_items = []
+                for item in items:
+                    serializer = BatchResponseItemSerializer(data=item)
+                    if serializer.is_valid():
+                        valid_items.append(serializer.validated_data)
+                    else:
+                        rejected.append({'question': item.get('question') if isinstance(item, dict) else None,
+                                         'detail': serializer.errors})
+
+                created, errors = submit_responses(session, valid_items, ignore_answered=True)
+                rejected.extend(
+                    {'question': str(valid_items[error['index']]['question']), 'detail': error['detail']}
+                    for error in errors
+                )
 
-        # Calculate the score
-        score = session.calculate_score()
+                if seq > session.sync_seq:
+                    session.sync_seq = seq
+                    session.save(update_fields=['sync_seq'])
+            elif session.status != 'in_progress' and items:
+                rejected = [{'question': None, 'detail': "This test session is no longer active."}]
+
+            answered = [
+                str(question_id) for question_id in
+                UserResponse.objects.filter(session=session).values_list('question_id', flat=True)
+            ]
+
+        if created:
+            for competitive_session_id in live_competitions(session.test_id):
+                broadcast(competitive_session_id, 'progress', {
+                    'user': request.user.username,
+                    'session': str(session.pk),
+                    'questions': [str(response.question_id) for response in created],
+                })
 
-        # Update user profile stats
-        profile = request.user.profile
-        profile.tests_taken += 1
-        profile.update_rating()
+        return Response({
+            "seq": session.sync_seq,
+            "status": session.status,
+            "answered": answered,
+            "created": [str(response.question_id) for response in created],
+            "rejected": rejected
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def questions(self, request, pk=None):
+        """Get a page of questions in the order of this session"""
+        session = self.get_object()
+
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {"detail": "offset and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            "count": len(session.get_question_order()),
+            "results": SessionQuestionSerializer(session.get_questions_page(offset, limit), many=True).data
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Complete the test session and calculate the score"""
+        session = self.get_object()
+        if self._expire_if_overdue(session):
+            return Response(
+                {"detail": "The time limit for this test session has expired."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        now = timezone.now()
+
+        with transaction.atomic():
+            # Only one request can move the session out of in_progress, so
+            # retried or concurrent calls can't record it twice
+            updated = TestSession.objects.filter(
+                pk=session.pk, status='in_progress'
+            ).update(status='completed', completed_at=now)
+            if not updated:
+                return Response(
+                    {"detail": "This test session is already completed."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            session.status = 'completed'
+            session.completed_at = now
+            session.user = request.user
+
+            # Calculate the score
+            score = session.calculate_score()
+            total = session.test.total_points
+
+            # Update user profile stats, the question rollups and the leaderboards
+            record_finished_sessions([session])
 
         return Response({
             "detail": "Test completed successfully.",
             "score": score,
-            "total": sum(q.points for q in session.test.questions.all())
+            "total": total
         }, status=status.HTTP_200_OK)
 
 
@@ -310,11 +534,12 @@ class CompetitiveSessionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return all active competitive sessions and ones created by the user"""
-        return CompetitiveSession.objects.filter(
-            is_active=True
-        ) | CompetitiveSession.objects.filter(
-            created_by=self.request.user
-        )
+        queryset = CompetitiveSession.objects.visible_to(self.request.user)
+
+        if self.action == 'list':
+            queryset = queryset.with_participants_count()
+
+        return queryset
 
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
@@ -338,6 +563,10 @@ class CompetitiveSessionViewSet(viewsets.ModelViewSet):
         # Start the session
         competitive_session.started_at = timezone.now()
         competitive_session.save()
+        invalidate_live_competitions(competitive_session.test_id)
+        broadcast(competitive_session.pk, 'started', {
+            'started_at': competitive_session.started_at.isoformat()
+        })
 
         return Response({
             "detail": "Competitive session started successfully.",
@@ -374,6 +603,10 @@ class CompetitiveSessionViewSet(viewsets.ModelViewSet):
         competitive_session.ended_at = timezone.now()
         competitive_session.is_active = False
         competitive_session.save()
+        invalidate_live_competitions(competitive_session.test_id)
+        broadcast(competitive_session.pk, 'ended', {
+            'ended_at': competitive_session.ended_at.isoformat()
+        })
 
         return Response({
             "detail": "Competitive session ended successfully.",
@@ -392,11 +625,24 @@ class CompetitiveSessionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get the leaderboard
-        leaderboard = competitive_session.get_leaderboard()
-        serializer = LeaderboardEntrySerializer(leaderboard, many=True)
+        # Serve a page of the materialized leaderboard
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response(
+                {"detail": "offset and limit must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        board = leaderboards.get(competitive_session)
+        me = board.entry_for(request.user.pk)
+
+        return Response({
+            "count": len(board),
+            "results": LeaderboardEntrySerializer(board.page(offset, limit), many=True).data,
+            "me": LeaderboardEntrySerializer(me).data if me else None
+        }, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
@@ -426,3 +672,53 @@ class CompetitiveSessionViewSet(viewsets.ModelViewSet):
 
         serializer = TestSessionSerializer(test_session)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Only allow users to see the jobs they started"""
+        return Job.objects.filter(created_by=self.request.user)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Streaming exports of sessions and responses for offline analysis, staff only.
+    ``?file_format=parquet|arrow|csv`` picks the format, ``?test=`` limits the
+    export to one test.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def list(self, request):
+        return Response({
+            "tables": list(TABLES),
+            "formats": available_formats()
+        }, status=status.HTTP_200_OK)
+
+    def retrieve(self, request, pk=None):
+        if pk not in TABLES:
+            return Response({"detail": "Unknown table."}, status=status.HTTP_404_NOT_FOUND)
+
+        file_format = request.query_params.get('file_format', default_format())
+        if file_format not in available_formats():
+            return Response(
+                {"detail": f"file_format must be one of {', '.join(available_formats())}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate before streaming, an error in the first chunk would come after the 200
+        test_id = request.query_params.get('test')
+        if test_id is not None:
+            try:
+                test_id = uuid.UUID(test_id)
+            except ValueError:
+                return Response({"detail": "test must be a UUID."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            iter_export(pk, file_format, test_id=test_id, chunk_size=settings.QUIZ_EXPORT_CHUNK_SIZE),
+            content_type=content_type(file_format)
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(pk, file_format)}"'
+        return response
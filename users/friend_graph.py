@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+Friendship = UserProfile.friends.through
+
+
+def _friends_cache_key(profile_id):
+    return f"users:friends:{profile_id}"
+
+
+def load_friend_ids(profile_ids):
+    """
+    Adjacency lists of several profiles in one query. The symmetrical M2M
+    stores both directions, so each side only has to look at its own rows.
+    """
+    adjacency = {profile_id: [] for profile_id in profile_ids}
+    for from_id, to_id in Friendship.objects.filter(
+        from_userprofile_id__in=profile_ids
+    ).values_list('from_userprofile_id', 'to_userprofile_id'):
+        adjacency[from_id].append(to_id)
+    return adjacency
+
+
+def get_friend_ids_many(profile_ids):
+    """Friend ids per profile, from the cache with one query for the misses"""
+    profile_ids = list(profile_ids)
+    keys = {_friends_cache_key(profile_id): profile_id for profile_id in profile_ids}
+    cached = cache.get_many(list(keys))
+    adjacency = {keys[key]: friend_ids for key, friend_ids in cached.items()}
+
+    missing = [profile_id for profile_id in profile_ids if profile_id not in adjacency]
+    if missing:
+        loaded = load_friend_ids(missing)
+        cache.set_many(
+            {_friends_cache_key(profile_id): friend_ids for profile_id, friend_ids in loaded.items()},
+            timeout=settings.USERS_FRIEND_GRAPH_CACHE_TIMEOUT
+        )
+        adjacency.update(loaded)
+    return adjacency
+
+
+def get_friend_ids(profile_id):
+    return get_friend_ids_many([profile_id])[profile_id]
+
+
+def invalidate_friends(profile_ids):
+    """Drop cached adjacency lists, they are rebuilt on the next lookup"""
+    cache.delete_many([_friends_cache_key(profile_id) for profile_id in profile_ids])
+
+
+def suggest_friends(profile_id, limit=20):
+    """
+    Friends of friends who aren't friends yet, ranked by the number of mutual
+    friends, then by profile id for a stable order. Returns a list of
+    (profile id, mutual friend count).
+    """
+    friend_ids = get_friend_ids(profile_id)
+    if not friend_ids:
+        return []
+
+    excluded = set(friend_ids)
+    excluded.add(profile_id)
+    mutual = Counter()
+    for friends_of_friend in get_friend_ids_many(friend_ids).values():
+        mutual.update(candidate for candidate in friends_of_friend if candidate not in excluded)
+
+    ranked = sorted(mutual.items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
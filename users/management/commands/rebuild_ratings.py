@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from quiz.models import Test, TestSession
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Rebuild profile point totals and ratings from completed and expired test sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        test_totals = dict(Test.objects.values_list('id', 'total_points'))
+
+        totals = defaultdict(lambda: [0, 0, 0])  # user id -> [taken, earned, possible]
+        completed = (
+            TestSession.objects.filter(status__in=TestSession.FINISHED_STATUSES)
+            .values('user', 'test')
+            .annotate(taken=Count('id'), earned=Sum('score'))
+            .values_list('user', 'test', 'taken', 'earned')
+        )
+        for user_id, test_id, taken, earned in completed:
+            entry = totals[user_id]
+            entry[0] += taken
+            entry[1] += earned or 0
+            entry[2] += taken * (test_totals.get(test_id) or 0)
+
+        fields = ['tests_taken', 'points_earned', 'points_possible', 'rating']
+        batch = []
+        updated = 0
+        for profile in UserProfile.objects.only('id', 'user_id', *fields).iterator(chunk_size=options['batch_size']):
+            profile.tests_taken, profile.points_earned, profile.points_possible = totals.get(profile.user_id, (0, 0, 0))
+            profile.rating = (
+                int((profile.points_earned / profile.points_possible) * 1000)
+                if profile.points_possible > 0 else 0
+            )
+            batch.append(profile)
+            if len(batch) >= options['batch_size']:
+                UserProfile.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            UserProfile.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {updated} profiles."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='rating',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Trigram indexes serve the icontains lookups of the user search, which
+# a btree can't with a leading wildcard. Django compiles icontains to
+# UPPER(column::text) LIKE UPPER(...), so that is the indexed expression.
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # The fuzzy match on usernames (username % text)
+    "CREATE INDEX users_auth_user_username_similar_trgm ON auth_user USING GIN (username gin_trgm_ops)",
+    "CREATE INDEX users_auth_user_username_trgm ON auth_user USING GIN ((UPPER(username::text)) gin_trgm_ops)",
+    "CREATE INDEX users_auth_user_email_trgm ON auth_user USING GIN ((UPPER(email::text)) gin_trgm_ops)",
+    "CREATE INDEX users_auth_user_first_name_trgm ON auth_user USING GIN ((UPPER(first_name::text)) gin_trgm_ops)",
+    "CREATE INDEX users_auth_user_last_name_trgm ON auth_user USING GIN ((UPPER(last_name::text)) gin_trgm_ops)",
+]
+
+REVERSE_SQL = [
+    "DROP INDEX IF EXISTS users_auth_user_last_name_trgm",
+    "DROP INDEX IF EXISTS users_auth_user_first_name_trgm",
+    "DROP INDEX IF EXISTS users_auth_user_email_trgm",
+    "DROP INDEX IF EXISTS users_auth_user_username_trgm",
+    "DROP INDEX IF EXISTS users_auth_user_username_similar_trgm",
+]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0004_userprofile_rating_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(FORWARD_SQL), run_on_postgres(REVERSE_SQL)),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 18:10
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_points(apps, schema_editor):
+    """
+    Fill the running point totals from the finished sessions, the same way
+    rebuild_ratings does. Without it the first completion after 0002 rates a
+    user on that one session only.
+    """
+    Question = apps.get_model('quiz', 'Question')
+    TestSession = apps.get_model('quiz', 'TestSession')
+    UserProfile = apps.get_model('users', 'UserProfile')
+
+    test_totals = dict(
+        Question.objects.order_by().values('test').annotate(total=Sum('points')).values_list('test', 'total')
+    )
+    totals = defaultdict(lambda: [0, 0])  # user id -> [earned, possible]
+    completed = (
+        TestSession.objects.filter(status__in=('completed', 'expired'))
+        .order_by()
+        .values('user', 'test')
+        .annotate(taken=Count('id'), earned=Sum('score'))
+        .values_list('user', 'test', 'taken', 'earned')
+    )
+    for user_id, test_id, taken, earned in completed:
+        totals[user_id][0] += earned or 0
+        totals[user_id][1] += taken * (test_totals.get(test_id) or 0)
+
+    batch = []
+    for profile in UserProfile.objects.filter(user_id__in=list(totals)).only('id', 'user_id').iterator(chunk_size=1000):
+        profile.points_earned, profile.points_possible = totals[profile.user_id]
+        batch.append(profile)
+        if len(batch) >= 1000:
+            UserProfile.objects.bulk_update(batch, ['points_earned', 'points_possible'])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ['points_earned', 'points_possible'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_search_trigram_indexes'),
+        ('quiz', '0002_answer_competitivesession_question_test_testsession_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_points, migrations.RunPython.noop),
+    ]
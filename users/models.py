@@ -1,6 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 
 
@@ -8,35 +8,43 @@ class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
-    rating = models.IntegerField(default=0)
+    rating = models.IntegerField(default=0, db_index=True)
     tests_taken = models.IntegerField(default=0)
     tests_created = models.IntegerField(default=0)
+    points_earned = models.IntegerField(default=0)
+    points_possible = models.IntegerField(default=0)
     friends = models.ManyToManyField('self', blank=True, symmetrical=True)
 
     def __str__(self):
         return self.user.username
 
     def update_rating(self):
-        """Update user rating based on test performance"""
-        from quiz.models import TestSession
-
-        # Get all completed test sessions
-        sessions = TestSession.objects.filter(user=self.user, status='completed')
-
-        if sessions.count() > 0:
-            # Calculate average score percentage
-            total_score = 0
-            total_possible = 0
-
-            for session in sessions:
-                score = session.calculate_score()
-                total_score += score
-                total_possible += sum(q.points for q in session.test.questions.all())
-
-            if total_possible > 0:
-                # Rating is percentage of correct answers * 10
-                self.rating = int((total_score / total_possible) * 1000)
-                self.save()
+        """Update user rating from the running point totals"""
+        if self.points_possible > 0:
+            old_rating = self.rating
+            # Rating is percentage of correct answers * 10
+            self.rating = new_rating = int((self.points_earned / self.points_possible) * 1000)
+            self.save(update_fields=['rating'])
+
+            if new_rating != old_rating:
+                from .rankings import ratings
+
+                transaction.on_commit(lambda: ratings.move(old_rating, new_rating))
+
+    def record_session(self, earned, possible):
+        """Add a completed test session to the running totals and update the rating"""
+        with transaction.atomic():
+            profile = UserProfile.objects.select_for_update().get(pk=self.pk)
+            profile.tests_taken += 1
+            profile.points_earned += earned
+            profile.points_possible += possible
+            profile.save(update_fields=['tests_taken', 'points_earned', 'points_possible'])
+            profile.update_rating()
+
+        self.tests_taken = profile.tests_taken
+        self.points_earned = profile.points_earned
+        self.points_possible = profile.points_possible
+        self.rating = profile.rating
 
 
 @receiver(post_save, sender=User)
@@ -52,6 +60,24 @@ def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
 
 
+@receiver(m2m_changed, sender=UserProfile.friends.through)
+def invalidate_friend_graph(sender, instance, action, pk_set, **kwargs):
+    """Drop the cached friend lists of both sides when a friendship changes, e.g. on accept"""
+    from .friend_graph import load_friend_ids, invalidate_friends
+
+    if action == 'pre_clear':
+        # The former friends can't be looked up after the clear
+        profile_ids = [instance.pk, *load_friend_ids([instance.pk])[instance.pk]]
+    elif action in ('post_add', 'post_remove'):
+        profile_ids = [instance.pk, *pk_set]
+    else:
+        return
+
+    invalidate_friends(profile_ids)
+    # Readers may cache the old lists until the change is committed
+    transaction.on_commit(lambda: invalidate_friends(profile_ids))
+
+
 class Achievement(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
@@ -88,6 +114,9 @@ class FriendRequest(models.Model):
 
     class Meta:
         unique_together = ('from_user', 'to_user')
+        indexes = [
+            models.Index(fields=['to_user', 'status']),
+        ]
 
     def __str__(self):
         return f"{self.from_user.username} -> {self.to_user.username} ({self.status})"
@@ -0,0 +1,168 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .friend_graph import get_friend_ids
+from .models import UserProfile
+
+# Ratings are the share of points earned scaled to 0..1000, see UserProfile.update_rating
+MAX_RATING = 1000
+
+
+class RatingIndex:
+    """
+    Number of profiles per rating in a Fenwick tree, so rank and percentile
+    queries take O(log n) in the rating range instead of a sort of the
+    profile table.
+
+    The index is process-local. It is rebuilt from one GROUP BY query when it
+    is older than ``rebuild_interval`` seconds and moved incrementally when a
+    rating changes in this process in between.
+    """
+
+    def __init__(self, max_rating=MAX_RATING, rebuild_interval=300):
+        self.size = max_rating + 1
+        self.rebuild_interval = rebuild_interval
+        self.total = 0
+        self.built_at = None
+        self._tree = [0] * (self.size + 1)
+        self._lock = threading.Lock()
+
+    def _clamp(self, rating):
+        return min(max(rating, 0), self.size - 1)
+
+    def _add(self, rating, delta):
+        i = self._clamp(rating) + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, rating):
+        if rating < 0:
+            return 0
+        i = self._clamp(rating) + 1
+        count = 0
+        while i > 0:
+            count += self._tree[i]
+            i -= i & -i
+        return count
+
+    def rebuild(self):
+        counts = (
+            UserProfile.objects.order_by()
+            .values('rating')
+            .annotate(n=Count('id'))
+            .values_list('rating', 'n')
+        )
+        tree = [0] * (self.size + 1)
+        total = 0
+        for rating, n in counts:
+            tree[self._clamp(rating) + 1] += n
+            total += n
+        # Turn the per-rating counts into a Fenwick tree in linear time
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+
+        with self._lock:
+            self._tree = tree
+            self.total = total
+            self.built_at = time.monotonic()
+
+    def refresh(self):
+        """Rebuild when the index has never been built or is older than the interval"""
+        if self.built_at is None or time.monotonic() - self.built_at > self.rebuild_interval:
+            self.rebuild()
+
+    def move(self, old_rating, new_rating):
+        """Apply a rating change, indexes that were never built are left for the first rebuild"""
+        with self._lock:
+            if self.built_at is None:
+                return
+            self._add(old_rating, -1)
+            self._add(new_rating, 1)
+
+    def count_above(self, rating):
+        with self._lock:
+            return self.total - self._count_at_most(rating)
+
+    def count_below(self, rating):
+        with self._lock:
+            return self._count_at_most(rating - 1)
+
+    def rank(self, rating):
+        """1-based rank, profiles with the same rating share it"""
+        return self.count_above(rating) + 1
+
+    def percentile(self, rating):
+        """Percentage of profiles with a lower rating"""
+        with self._lock:
+            if not self.total:
+                return 0.0
+            return 100 * self._count_at_most(rating - 1) / self.total
+
+
+ratings = RatingIndex(rebuild_interval=settings.USERS_RANKING_REBUILD_INTERVAL)
+
+
+def global_ranking(profile, neighbors=3):
+    """
+    Rank and percentile of a profile among all profiles, with up to
+    ``neighbors`` profiles right above and right below it. Ties are ordered
+    by profile id.
+    """
+    ratings.refresh()
+    rating = profile.rating
+
+    above = list(
+        UserProfile.objects.select_related('user')
+        .filter(Q(rating__gt=rating) | Q(rating=rating, id__lt=profile.pk))
+        .order_by('rating', '-id')[:neighbors]
+    )
+    above.reverse()
+    below = list(
+        UserProfile.objects.select_related('user')
+        .filter(Q(rating__lt=rating) | Q(rating=rating, id__gt=profile.pk))
+        .order_by('-rating', 'id')[:neighbors]
+    )
+    for neighbor in above + below:
+        neighbor.rank = ratings.rank(neighbor.rating)
+
+    return {
+        'rank': ratings.rank(rating),
+        'total': ratings.total,
+        'percentile': ratings.percentile(rating),
+        'above': above,
+        'below': below,
+    }
+
+
+def friends_ranking(profile, neighbors=3):
+    """Rank and percentile of a profile among itself and its friends, ranked in memory"""
+    friend_ids = get_friend_ids(profile.pk)
+    profiles = list(
+        UserProfile.objects.select_related('user')
+        .filter(id__in=[profile.pk, *friend_ids])
+        .order_by('-rating', 'id')
+    )
+
+    position = next(i for i, candidate in enumerate(profiles) if candidate.pk == profile.pk)
+    rating = profiles[position].rating
+    lower = sum(1 for candidate in profiles if candidate.rating < rating)
+
+    rank = 0
+    for i, candidate in enumerate(profiles):
+        if i == 0 or candidate.rating != profiles[i - 1].rating:
+            rank = i + 1
+        candidate.rank = rank
+
+    return {
+        'rank': profiles[position].rank,
+        'total': len(profiles),
+        'percentile': 100 * lower / len(profiles),
+        'above': profiles[max(0, position - neighbors):position],
+        'below': profiles[position + 1:position + 1 + neighbors],
+    }
@@ -0,0 +1,25 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+
+
+def search_users(queryset, text):
+    """
+    Users whose username, email or name contains ``text``. On Postgres the
+    ``icontains`` lookups are served by trigram indexes, usernames that are
+    only similar match as well and the closest usernames come first.
+    """
+    matches = (
+        Q(username__icontains=text)
+        | Q(email__icontains=text)
+        | Q(first_name__icontains=text)
+        | Q(last_name__icontains=text)
+    )
+    if connection.vendor != 'postgresql':
+        return queryset.filter(matches).order_by('username')
+
+    return (
+        queryset.filter(matches | Q(username__trigram_similar=text))
+        .annotate(similarity=TrigramSimilarity('username', text))
+        .order_by('-similarity', 'username')
+    )
@@ -75,6 +75,20 @@ class FriendSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'username', 'avatar', 'rating')
 
 
+class FriendSuggestionSerializer(FriendSerializer):
+    mutual_friends = serializers.IntegerField(read_only=True)
+
+    class Meta(FriendSerializer.Meta):
+        fields = FriendSerializer.Meta.fields + ('mutual_friends',)
+
+
+class RankedFriendSerializer(FriendSerializer):
+    rank = serializers.IntegerField(read_only=True)
+
+    class Meta(FriendSerializer.Meta):
+        fields = FriendSerializer.Meta.fields + ('rank',)
+
+
 class AchievementSerializer(serializers.ModelSerializer):
     class Meta:
         model = Achievement
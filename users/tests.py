@@ -1,3 +1,106 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import UserProfile
+from .rankings import ratings
+
+
+def make_user(username, rating=0):
+    user = User.objects.create_user(username, email=f"{username}@example.com", password='secret')
+    UserProfile.objects.filter(user=user).update(rating=rating)
+    return User.objects.select_related('profile').get(pk=user.pk)
+
+
+class FriendGraphTests(TestCase):
+    def setUp(self):
+        # Adjacency lists are cached by profile id, which the test database reuses
+        cache.clear()
+        self.me = make_user('me')
+        self.friends = [make_user(f'friend{i}') for i in range(3)]
+        self.me.profile.friends.add(*[friend.profile for friend in self.friends])
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_friends_within_budget(self):
+        response = self.client.get(f'/api/users/profiles/{self.me.profile.pk}/friends/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(friend['username'] for friend in response.data), ['friend0', 'friend1', 'friend2'])
+
+    def test_suggests_friends_of_friends_by_mutual_friends(self):
+        popular, other = make_user('popular'), make_user('other')
+        for friend in self.friends:
+            friend.profile.friends.add(popular.profile)
+        self.friends[0].profile.friends.add(other.profile)
+
+        response = self.client.get('/api/users/profiles/suggestions/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(suggestion['username'], suggestion['mutual_friends']) for suggestion in response.data],
+            [('popular', 3), ('other', 1)]
+        )
+
+    def test_unfriending_invalidates_suggestions(self):
+        stranger = make_user('stranger')
+        self.friends[0].profile.friends.add(stranger.profile)
+        self.assertEqual(len(self.client.get('/api/users/profiles/suggestions/').data), 1)
+
+        self.friends[0].profile.friends.remove(stranger.profile)
+
+        self.assertEqual(self.client.get('/api/users/profiles/suggestions/').data, [])
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_user('me', rating=500)
+        for i, rating in enumerate([900, 700, 500, 300, 100]):
+            make_user(f'user{i}', rating=rating)
+        ratings.rebuild()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def test_global_ranking(self):
+        response = self.client.get('/api/users/profiles/ranking/?neighbors=1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rank'], response.data['total']), (3, 6))
+        self.assertEqual(response.data['percentile'], round(100 * 2 / 6, 2))
+        self.assertEqual([profile['rating'] for profile in response.data['above']], [700])
+        self.assertEqual([profile['rating'] for profile in response.data['below']], [500])
+
+    def test_friends_ranking(self):
+        friend = User.objects.get(username='user0')
+        self.me.profile.friends.add(friend.profile)
+
+        response = self.client.get('/api/users/profiles/ranking/?scope=friends')
+
+        self.assertEqual((response.data['rank'], response.data['total']), (2, 2))
+        self.assertEqual([profile['username'] for profile in response.data['above']], ['user0'])
+
+    def test_rejects_unknown_scope(self):
+        self.assertEqual(self.client.get('/api/users/profiles/ranking/?scope=world').status_code, 400)
+
+
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.me = make_user('me')
+        for username in ['alice', 'alina', 'bob']:
+            make_user(username)
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def test_search_is_paginated(self):
+        response = self.client.get('/api/users/users/?search=ali')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([user['username'] for user in response.data['results']], ['alice', 'alina'])
+
+    def test_listing_keeps_its_shape(self):
+        response = self.client.get('/api/users/users/')
+        self.assertEqual(len(response.data), 4)
@@ -10,6 +10,7 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db.models import Q
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
@@ -18,8 +19,12 @@ from .models import UserProfile, Achievement, UserAchievement, FriendRequest
 from .serializers import (
     UserSerializer, UserProfileSerializer, AchievementSerializer,
     UserAchievementSerializer, FriendRequestSerializer, FriendSerializer,
-    SignupSerializer  # We'll create this serializer
+    FriendSuggestionSerializer, RankedFriendSerializer, SignupSerializer  # We'll create this serializer
 )
+from .friend_graph import suggest_friends
+from .rankings import friends_ranking, global_ranking
+from .search import search_users
+from config.pagination import SearchPagination
 from drf_spectacular.utils import extend_schema
 
 @extend_schema(
@@ -99,6 +104,7 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchPagination
 
     def get_queryset(self):
         """Allow searching for users"""
@@ -106,15 +112,16 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         search = self.request.query_params.get('search')
 
         if search:
-            queryset = queryset.filter(
-                Q(username__icontains=search) |
-                Q(email__icontains=search) |
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search)
-            )
+            queryset = search_users(queryset, search)
 
         return queryset
 
+    def paginate_queryset(self, queryset):
+        # Only search results are paginated, the plain listing keeps its shape
+        if not self.request.query_params.get('search'):
+            return None
+        return super().paginate_queryset(queryset)
+
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get the current user's data"""
@@ -164,9 +171,59 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def friends(self, request, pk=None):
         """Get a user's friends"""
         profile = self.get_object()
-        serializer = FriendSerializer(profile.friends.all(), many=True)
+        serializer = FriendSerializer(profile.friends.select_related('user'), many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """Suggest friends of friends, ranked by the number of mutual friends"""
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.USERS_MAX_FRIEND_SUGGESTIONS))
+
+        ranked = suggest_friends(request.user.profile.pk, limit)
+        profiles = UserProfile.objects.select_related('user').in_bulk([profile_id for profile_id, _ in ranked])
+
+        suggestions = []
+        for profile_id, mutual_friends in ranked:
+            profile = profiles.get(profile_id)
+            if profile is not None:
+                profile.mutual_friends = mutual_friends
+                suggestions.append(profile)
+
+        serializer = FriendSuggestionSerializer(suggestions, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def ranking(self, request):
+        """The current user's rank, percentile and neighbors, globally or among friends"""
+        scope = request.query_params.get('scope', 'global')
+        if scope not in ('global', 'friends'):
+            return Response({"detail": "scope must be 'global' or 'friends'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            neighbors = int(request.query_params.get('neighbors', 3))
+        except ValueError:
+            return Response({"detail": "neighbors must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        neighbors = max(0, min(neighbors, settings.USERS_MAX_RANKING_NEIGHBORS))
+
+        profile = request.user.profile
+        if scope == 'friends':
+            ranking = friends_ranking(profile, neighbors)
+        else:
+            ranking = global_ranking(profile, neighbors)
+
+        return Response({
+            "scope": scope,
+            "rating": profile.rating,
+            "rank": ranking['rank'],
+            "total": ranking['total'],
+            "percentile": round(ranking['percentile'], 2),
+            "above": RankedFriendSerializer(ranking['above'], many=True).data,
+            "below": RankedFriendSerializer(ranking['below'], many=True).data,
+        })
+
 
 class FriendRequestViewSet(viewsets.ModelViewSet):
     serializer_class = FriendRequestSerializer